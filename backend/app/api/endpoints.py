@@ -1,8 +1,23 @@
-from fastapi import APIRouter, HTTPException, Body
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from ..services.data_loader import DataLoader
 from ..services.ai_service import ai_service
+from ..services.executor import run_blocking
+from ..services.jobs import job_store
+from ..services.pregeneration import pregenerator
+from ..services.downsampling import DOWNSAMPLING_METHODS, downsample_frame, downsample_records
+from ..services.metrics import AGGREGATIONS, GRANULARITIES
+from ..services.warmup import PERIOD_DAYS, REPORT_FILES, warmup
+from .responses import (
+    RESPONSE_FORMATS, columnar_report, columnar_response, dumps, frame_to_columns,
+    make_etag, not_modified, not_modified_response, sse_event, sse_response,
+)
+from typing import Any, Dict, List, Optional
+import base64
+import hashlib
+import json
 import os
+import pandas as pd
 
 router = APIRouter()
 
@@ -12,50 +27,367 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.pa
 DATA_DIR = os.path.join(BASE_DIR, "cleaned")
 data_loader = DataLoader(DATA_DIR)
 
+# Chart series in the advanced reports and the value each is decimated on
+REPORT_SERIES = {
+    "hr_metrics": "heart_rate",
+    "sleeping_hr_metrics": "sleeping_heart_rate",
+    "sleep_metrics": "sleep_score",
+}
+
+# Upper bound on the buckets a single metrics query may return per metric
+MAX_QUERY_BUCKETS = 10000
+
+ROW_FORMATS = ("ndjson", "columnar")
+# Rows serialized per chunk while streaming a page of raw data
+STREAM_CHUNK_ROWS = 5000
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Inverse of encode_cursor(); raises 400 for anything it did not produce."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(state, dict) or not isinstance(state.get("v"), str):
+            raise ValueError(cursor)
+        if "p" in state:
+            if not isinstance(state["p"], int) or state["p"] < 0:
+                raise ValueError(cursor)
+        else:
+            if not isinstance(state.get("k"), int) or state["k"] < 1:
+                raise ValueError(cursor)
+            if state.get("t") is not None:
+                state["t"] = pd.Timestamp(state["t"])
+        return state
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def version_token(version: tuple) -> str:
+    return hashlib.sha256(repr(version).encode()).hexdigest()[:16]
+
+def parse_time(value: Optional[str], name: str) -> Optional[pd.Timestamp]:
+    """Parses an ISO timestamp parameter (wall-clock time, like the exports) or raises 400."""
+    if not value:
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO timestamp")
+    return ts.tz_localize(None) if ts.tzinfo is not None else ts
+
+def check_downsample_method(method: str):
+    if method not in DOWNSAMPLING_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown downsampling method '{method}', expected one of {', '.join(DOWNSAMPLING_METHODS)}")
+
+def check_response_format(format: str):
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}', expected one of {', '.join(RESPONSE_FORMATS)}")
+
+def data_version(filenames: List[str]) -> tuple:
+    """Loaded version of every file (None if missing), the basis of the ETags."""
+    versions = []
+    for filename in filenames:
+        try:
+            versions.append((filename, data_loader.file_version(filename)))
+        except FileNotFoundError:
+            versions.append((filename, None))
+    return tuple(versions)
+
+def downsample_report(data: Dict[str, Any], max_points: Optional[int], method: str) -> Dict[str, Any]:
+    """Copy of an aggregation result with its chart series reduced to max_points each."""
+    if not max_points:
+        return data
+    reduced = dict(data)
+    for key, value_key in REPORT_SERIES.items():
+        if isinstance(data.get(key), list):
+            reduced[key] = downsample_records(data[key], value_key, max_points, method)
+    return reduced
+
 @router.get("/data/files")
 async def list_files():
     """List all available data files."""
     try:
-        files = data_loader.get_all_data_files()
+        files = await run_blocking(data_loader.get_all_data_files)
         return {"files": files}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/data/{filename}")
-async def get_data(filename: str, limit: int = 100):
-    """Get raw data from a specific file."""
-    try:
+async def get_data(
+    request: Request,
+    filename: str,
+    limit: int = 100,
+    max_points: Optional[int] = Query(None, ge=3),
+    downsample: str = "lttb",
+    value_column: Optional[str] = None,
+    format: str = "records"
+):
+    """Get raw data from a specific file.
+
+    With `max_points`, the whole file is decimated to that many rows instead of
+    returning the first `limit` ones. `format=columnar` returns the rows as
+    {column: [values]} with an ETag, and 304 when the file hasn't changed.
+    """
+    check_downsample_method(downsample)
+    check_response_format(format)
+
+    def select_rows():
         df = data_loader.load_csv(filename)
-        # Handle NaN values for JSON serialization
-        data = df.head(limit).fillna("").to_dict(orient="records")
+        if value_column is not None and value_column not in df.columns:
+            raise HTTPException(status_code=400, detail=f"Unknown column '{value_column}'")
+        if max_points:
+            rows = downsample_frame(df, max_points, value_column, data_loader.get_time_column(df), downsample)
+        else:
+            rows = df.head(limit)
+        return df, rows
+
+    def build():
+        df, rows = select_rows()
+        # Handle NaN values for JSON serialization ("" is not a category of categorical columns)
+        categorical = rows.select_dtypes(include='category').columns
+        data = rows.astype({col: object for col in categorical}).fillna("").to_dict(orient="records")
         return {"filename": filename, "total_rows": len(df), "data": data}
+
+    def build_columnar():
+        df, rows = select_rows()
+        return dumps({"filename": filename, "total_rows": len(df), "columns": list(rows.columns), "data": frame_to_columns(rows)})
+
+    try:
+        await warmup.wait_for([filename])
+        if format == "columnar":
+            version = await run_blocking(data_loader.file_version, filename)
+            etag = make_etag(filename, version, limit, max_points, downsample, value_column)
+            if not_modified(request, etag):
+                return not_modified_response(etag)
+            return columnar_response(await run_blocking(build_columnar), etag)
+        return await run_blocking(build)
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/data/{filename}/rows")
+async def stream_rows(
+    filename: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=100000),
+    columns: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    format: str = "ndjson"
+):
+    """Stream one page of raw rows as NDJSON or as columnar JSON arrays.
+
+    `start`/`end` restrict the page to a time range, `columns` is a comma
+    separated projection. The cursor of the following page is returned in the
+    X-Next-Cursor header (absent on the last page). It holds the time of the
+    last row sent and how many rows of that time were sent, so the next page
+    starts after it wherever rows are added; a cursor issued for an earlier
+    version of the file is rejected with 409.
+    """
+    if format not in ROW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}', expected one of {', '.join(ROW_FORMATS)}")
+    after = decode_cursor(cursor) if cursor else None
+    start_ts = parse_time(start, "start")
+    end_ts = parse_time(end, "end")
+
+    def locate():
+        version = version_token(data_loader.file_version(filename))
+        if after is not None and after["v"] != version:
+            raise HTTPException(status_code=409, detail="The file changed since this cursor was issued; start again without a cursor")
+        df, lo, hi = data_loader.window_bounds(filename, start_ts, end_ts)
+        if (start_ts is not None or end_ts is not None) and not data_loader.get_time_column(df):
+            raise HTTPException(status_code=400, detail=f"{filename} has no time column to filter on")
+        selected = list(df.columns)
+        if columns:
+            selected = [c.strip() for c in columns.split(",") if c.strip()]
+            missing = [c for c in selected if c not in df.columns]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(missing)}")
+        time_col = data_loader.get_time_column(df)
+        if time_col and not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+            time_col = None
+        first = lo
+        if after is not None:
+            if "p" in after:
+                first = lo + after["p"]
+            elif time_col is None:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            else:
+                times = df[time_col]
+                # Rows without a time are sorted last
+                anchor = times.searchsorted(after["t"], side='left') if after["t"] is not None else int(times.notna().sum())
+                first = max(lo, int(anchor) + after["k"])
+        last = min(hi, first + limit)
+        page = df.iloc[first:last][selected] if first < last else df.iloc[0:0][selected]
+        next_cursor = None
+        if last < hi:
+            if time_col is None:
+                next_cursor = encode_cursor({"v": version, "p": last - lo})
+            else:
+                times = df[time_col]
+                last_time = times.iloc[last - 1]
+                if pd.isna(last_time):
+                    k = last - int(times.notna().sum())
+                    last_time = None
+                else:
+                    k = last - int(times.searchsorted(last_time, side='left'))
+                    last_time = last_time.isoformat()
+                next_cursor = encode_cursor({"v": version, "t": last_time, "k": k})
+        return page, hi - lo, next_cursor
+
+    try:
+        await warmup.wait_for([filename])
+        page, total_rows, next_cursor = await run_blocking(locate)
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def ndjson():
+        for offset in range(0, len(page), STREAM_CHUNK_ROWS):
+            chunk = page.iloc[offset:offset + STREAM_CHUNK_ROWS]
+            yield await run_blocking(chunk.to_json, orient="records", lines=True, date_format="iso", date_unit="s")
+
+    async def columnar():
+        yield json.dumps({"filename": filename, "total_rows": total_rows, "next_cursor": next_cursor, "columns": list(page.columns)})[:-1]
+        yield ', "data": {'
+        for i, col in enumerate(page.columns):
+            values = await run_blocking(page[col].to_json, orient="values", date_format="iso", date_unit="s")
+            yield f'{", " if i else ""}{json.dumps(col)}: {values}'
+        yield '}}'
+
+    headers = {"X-Total-Rows": str(total_rows)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    if format == "ndjson":
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(columnar(), media_type="application/json", headers=headers)
+
 @router.get("/data/{filename}/summary")
 async def get_data_summary(filename: str):
     """Get statistical summary of a file."""
     try:
-        summary = data_loader.get_summary(filename)
+        await warmup.wait_for([filename])
+        summary = await run_blocking(data_loader.get_summary, filename)
         return {"filename": filename, "summary": summary}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def report_job(report: str, period: str, reference: pd.Timestamp):
+    """Run of a background report analysis: streams the insight chunks, then its result."""
+    async def run(job):
+        await warmup.wait_for(REPORT_FILES[report])
+        days = PERIOD_DAYS.get(period, 30)
+        if report == "sleep":
+            data = await run_blocking(data_loader.aggregate_sleep_data, days, reference)
+            if not data:
+                raise ValueError("No sleep data found for analysis")
+            insight_stream = await ai_service.analyze_sleep_advanced(data, period, stream=True)
+        else:
+            data = await run_blocking(data_loader.aggregate_heart_rate_data, days, reference)
+            if not data or not data.get('metrics'):
+                raise ValueError("No heart rate data found for analysis")
+            insight_stream = await ai_service.analyze_heart_rate_advanced(data, period, stream=True)
+        yield ("status", {"cache": insight_stream.cache_status, "queue_position": insight_stream.queue_position})
+
+        # The stream's own done event becomes the job's result, or its
+        # error when the generation failed
+        parts = []
+        timings = None
+        async for kind, data in insight_stream:
+            if kind == "done":
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                continue
+            if kind == "response":
+                parts.append(data["text"])
+            elif kind == "metrics":
+                timings = data
+            yield (kind, data)
+        yield ("result", {
+            "period": period,
+            "end": reference.isoformat(),
+            "insight": "".join(parts) or 'No response from AI.',
+            "cache": insight_stream.cache_status,
+            "timings": timings,
+        })
+    return run
+
+@router.post("/analyze/jobs", status_code=202)
+async def submit_analysis_job(
+    report: str = Body(..., embed=True),
+    period: str = Body(..., embed=True),
+    end: Optional[str] = Body(None, embed=True)
+):
+    """Start an advanced sleep or heart rate analysis in the background.
+
+    Returns the job status with its `job_id`. The analysis goes on when the
+    client disconnects; follow it on /analyze/jobs/{job_id}/events and fetch
+    the result from /analyze/jobs/{job_id}. While a job for the same report,
+    period and reference time is unfinished, that job is returned instead of
+    a new one.
+    """
+    if report not in REPORT_FILES:
+        raise HTTPException(status_code=400, detail=f"Unknown report '{report}', expected one of {', '.join(REPORT_FILES)}")
+    reference = parse_time(end, "end") or data_loader.metrics.reference_time()
+    params = {"report": report, "period": period, "end": end}
+    # Keyed on the resolved reference, so a job without `end` isn't reused once the day rolled over
+    job = job_store.submit(report, params, report_job(report, period, reference), key=f"{report}:{period}:{reference.isoformat()}")
+    return job.status()
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """State of a background analysis and, once it is done, its result."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return job.status()
+
+@router.get("/analyze/jobs/{job_id}/events")
+async def stream_analysis_job(
+    job_id: str,
+    last_event_id: Optional[int] = Query(None, ge=0),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Server-Sent Events of a background analysis: status, thinking/response/metrics, then done or error.
+
+    Every event carries an id. A client that reconnects with Last-Event-ID
+    (EventSource sends it automatically) or ?last_event_id= continues after
+    that event; a finished job replays its events and closes the stream.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    after = last_event_id or 0
+    if last_event_id_header:
+        try:
+            after = int(last_event_id_header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an event id")
+
+    async def events():
+        async for event_id, name, data in job.subscribe(after):
+            yield sse_event(name, data, event_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/analyze/{filename}")
 async def analyze_file(filename: str):
     """Generate AI insights for a specific file."""
     try:
-        # Load a chunk of data for analysis (e.g. last 30 days or first 100 rows)
-        # For simplicity, loading first 100 rows or using summary
-        df = data_loader.load_csv(filename)
-        data_subset = df.head(100).to_dict(orient="records")
-        
-        insight = ai_service.analyze_data(filename, data_subset)
-        return {"filename": filename, "insight": insight}
+        # The prompt is built from the cached column statistics of the whole file
+        await warmup.wait_for([filename])
+        summary = await run_blocking(data_loader.get_summary, filename)
+
+        result = await ai_service.analyze_data(filename, summary)
+        return {"filename": filename, "insight": result["insight"], "cache": result["cache"], "timings": result["timings"]}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
@@ -65,64 +397,169 @@ async def analyze_file(filename: str):
 
 @router.post("/analyze/sleep/advanced")
 async def analyze_sleep_advanced(
+    request: Request,
     period: str = Body(..., embed=True),
     skip_analysis: bool = Body(False, embed=True),
-    stream: bool = Body(False, embed=True)
+    stream: bool = Body(False, embed=True),
+    max_points: Optional[int] = Body(None, embed=True, ge=3),
+    downsample: str = Body("lttb", embed=True),
+    end: Optional[str] = Body(None, embed=True),
+    format: str = Body("records", embed=True)
 ):
-    """Generate advanced sleep insights or just fetch data."""
+    """Generate advanced sleep insights or just fetch data.
+
+    With `stream: true` the insight is sent as Server-Sent Events: thinking
+    and response (coalesced tokens), metrics (Ollama timings) and done.
+    The period ends at `end` (ISO timestamp) when given, otherwise now.
+    `format: "columnar"` returns the chart series as {key: [values]}; data-only
+    requests then carry an ETag and get 304 while the data is unchanged.
+    """
+    check_downsample_method(downsample)
+    check_response_format(format)
+    reference = parse_time(end, "end") or data_loader.metrics.reference_time()
     try:
-        days = 7 if period == "week" else 30
-        data = data_loader.aggregate_sleep_data(days)
+        days = PERIOD_DAYS.get(period, 30)
+        await warmup.wait_for(REPORT_FILES["sleep"])
+        etag = None
+        if format == "columnar" and skip_analysis:
+            version = await run_blocking(data_version, REPORT_FILES["sleep"])
+            etag = make_etag("sleep", version, period, days, reference, max_points, downsample, format)
+            if not_modified(request, etag):
+                return not_modified_response(etag)
+        data = await run_blocking(data_loader.aggregate_sleep_data, days, reference)
         
         if not data:
             raise HTTPException(status_code=404, detail="No sleep data found for analysis")
             
         if skip_analysis:
-            return {"period": period, "insight": None, "data_used": data}
+            if format == "columnar":
+                body = await run_blocking(lambda: dumps({"period": period, "insight": None, "data_used": columnar_report(downsample_report(data, max_points, downsample))}))
+                return columnar_response(body, etag)
+            return {"period": period, "insight": None, "data_used": downsample_report(data, max_points, downsample)}
             
         if stream:
-            return StreamingResponse(
-                ai_service.analyze_sleep_advanced(data, period, stream=True),
-                media_type="text/event-stream"
-            )
+            insight_stream = await ai_service.analyze_sleep_advanced(data, period, stream=True)
+            return sse_response(insight_stream, {
+                "X-Insight-Cache": insight_stream.cache_status,
+                "X-Queue-Position": str(insight_stream.queue_position),
+            })
             
-        insight = ai_service.analyze_sleep_advanced(data, period)
-        return {"period": period, "insight": insight, "data_used": data}
+        result = await ai_service.analyze_sleep_advanced(data, period)
+        data_used = downsample_report(data, max_points, downsample)
+        if format == "columnar":
+            return Response(dumps({"period": period, "insight": result["insight"], "cache": result["cache"], "timings": result["timings"], "data_used": columnar_report(data_used)}), media_type="application/json")
+        return {"period": period, "insight": result["insight"], "cache": result["cache"], "timings": result["timings"], "data_used": data_used}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters and memory use of the data, metric and insight caches."""
+    return {
+        "data": data_loader.cache.stats(),
+        "metrics": data_loader.metrics.stats(),
+        "insights": await run_blocking(ai_service.insight_cache.stats),
+        "jobs": job_store.stats(),
+    }
+
+
 @router.get("/ai/status")
 async def get_ai_status():
     """Check AI (Ollama) connection status and current model."""
-    return ai_service.check_ollama_status()
+    return {**await ai_service.check_ollama_status(), "pregeneration": pregenerator.status()}
 
 @router.post("/analyze/heart_rate/advanced")
 async def analyze_heart_rate_advanced(
+    request: Request,
     period: str = Body(..., embed=True),
     skip_analysis: bool = Body(False, embed=True),
-    stream: bool = Body(False, embed=True)
+    stream: bool = Body(False, embed=True),
+    max_points: Optional[int] = Body(None, embed=True, ge=3),
+    downsample: str = Body("lttb", embed=True),
+    end: Optional[str] = Body(None, embed=True),
+    format: str = Body("records", embed=True)
 ):
-    """Generate advanced heart rate insights or just fetch data."""
+    """Generate advanced heart rate insights or just fetch data.
+
+    With `stream: true` the insight is sent as Server-Sent Events: thinking
+    and response (coalesced tokens), metrics (Ollama timings) and done.
+    The period ends at `end` (ISO timestamp) when given, otherwise now.
+    `format: "columnar"` returns the chart series as {key: [values]}; data-only
+    requests then carry an ETag and get 304 while the data is unchanged.
+    """
+    check_downsample_method(downsample)
+    check_response_format(format)
+    reference = parse_time(end, "end") or data_loader.metrics.reference_time()
     try:
-        period_map = {"week": 7, "month": 30, "90d": 90, "180d": 180}
-        days = period_map.get(period, 30)
-        data = data_loader.aggregate_heart_rate_data(days)
+        days = PERIOD_DAYS.get(period, 30)
+        await warmup.wait_for(REPORT_FILES["heart_rate"])
+        etag = None
+        if format == "columnar" and skip_analysis:
+            version = await run_blocking(data_version, REPORT_FILES["heart_rate"])
+            etag = make_etag("heart_rate", version, period, days, reference, max_points, downsample, format)
+            if not_modified(request, etag):
+                return not_modified_response(etag)
+        data = await run_blocking(data_loader.aggregate_heart_rate_data, days, reference)
         
         if not data or not data.get('metrics'):
             raise HTTPException(status_code=404, detail="No heart rate data found for analysis")
             
         if skip_analysis:
-            return {"period": period, "insight": None, "data_used": data}
+            if format == "columnar":
+                body = await run_blocking(lambda: dumps({"period": period, "insight": None, "data_used": columnar_report(downsample_report(data, max_points, downsample))}))
+                return columnar_response(body, etag)
+            return {"period": period, "insight": None, "data_used": downsample_report(data, max_points, downsample)}
             
         if stream:
-            return StreamingResponse(
-                ai_service.analyze_heart_rate_advanced(data, period, stream=True),
-                media_type="text/event-stream"
-            )
+            insight_stream = await ai_service.analyze_heart_rate_advanced(data, period, stream=True)
+            return sse_response(insight_stream, {
+                "X-Insight-Cache": insight_stream.cache_status,
+                "X-Queue-Position": str(insight_stream.queue_position),
+            })
             
-        insight = ai_service.analyze_heart_rate_advanced(data, period)
-        return {"period": period, "insight": insight, "data_used": data}
+        result = await ai_service.analyze_heart_rate_advanced(data, period)
+        data_used = downsample_report(data, max_points, downsample)
+        if format == "columnar":
+            return Response(dumps({"period": period, "insight": result["insight"], "cache": result["cache"], "timings": result["timings"], "data_used": columnar_report(data_used)}), media_type="application/json")
+        return {"period": period, "insight": result["insight"], "cache": result["cache"], "timings": result["timings"], "data_used": data_used}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/metrics/query")
+async def query_metrics(
+    start: str = Body(..., embed=True),
+    end: str = Body(..., embed=True),
+    metrics: List[str] = Body(..., embed=True),
+    granularity: str = Body("day", embed=True),
+    aggs: List[str] = Body(["mean", "min", "max"], embed=True)
+):
+    """Aggregate metrics over an explicit [start, end) window at hour/day/week/month granularity.
+
+    `metrics` are named metrics (heart_rate, hrv, spo2, sleep_score, ...) or
+    "<file>:<column>" references; `aggs` any of count, sum, mean, min, max, std.
+    """
+    start_ts = parse_time(start, "start")
+    end_ts = parse_time(end, "end")
+    if start_ts is None or end_ts is None or start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity '{granularity}', expected one of {', '.join(GRANULARITIES)}")
+    unknown = [a for a in aggs if a not in AGGREGATIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown aggregations: {', '.join(unknown)}")
+    if not metrics:
+        raise HTTPException(status_code=400, detail="No metrics requested")
+    if granularity == "hour" and (end_ts - start_ts) / pd.Timedelta(hours=1) > MAX_QUERY_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Window too long for hourly buckets (max {MAX_QUERY_BUCKETS})")
+
+    try:
+        await warmup.wait_for(warmup.files)
+        return await run_blocking(data_loader.metrics.query, metrics, start_ts, end_ts, granularity, aggs)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,87 @@
+import hashlib
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "records" is the default list-of-objects layout, "columnar" the compact one
+RESPONSE_FORMATS = ("records", "columnar")
+
+def _default(value: Any) -> Any:
+    """Encodes what orjson (or json) can't serialize natively."""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat() if value is not pd.NaT else None
+    if isinstance(value, np.ndarray):
+        return [None if v is None or (isinstance(v, float) and np.isnan(v)) else v for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """Serializes with orjson (NumPy arrays and scalars natively), or json if it isn't installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+def frame_to_columns(df: pd.DataFrame) -> Dict[str, Any]:
+    """{column: values} of a frame, with timestamps as ISO strings and missing values as null."""
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = np.datetime_as_string(series.to_numpy(dtype='datetime64[s]'), unit='s')
+            columns[col] = np.where(series.isna().to_numpy(), None, values).astype(object)
+        elif isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+            columns[col] = series.astype(object).where(series.notna(), None).to_numpy()
+        else:
+            columns[col] = series.to_numpy()
+    return columns
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Turns a list of objects into {key: [values]}; keys missing from a record become null."""
+    keys = list(dict.fromkeys(key for record in records for key in record))
+    return {key: [record.get(key) for record in records] for key in keys}
+
+def columnar_report(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of an aggregation result with every list of records in columnar layout."""
+    return {
+        key: records_to_columns(value) if isinstance(value, list) and value and isinstance(value[0], dict) else value
+        for key, value in data.items()
+    }
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag over the data version and the request parameters that shape the response."""
+    return 'W/"' + hashlib.sha256(repr(parts).encode()).hexdigest()[:20] + '"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def columnar_response(body: bytes, etag: str) -> Response:
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def sse_event(name: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """One Server-Sent Events frame with JSON data."""
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    return (frame + f"event: {name}\ndata: ").encode() + dumps(data) + b"\n\n"
+
+async def sse_stream(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[bytes]:
+    """Frames (kind, data) events, e.g. of an InsightStream, as Server-Sent Events."""
+    async for name, data in events:
+        yield sse_event(name, data)
+
+def sse_response(events: AsyncIterator[Tuple[str, Any]], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers={"Cache-Control": "no-cache", **(headers or {})})
@@ -1,8 +1,42 @@
-from fastapi import FastAPI
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .api import endpoints
+from .services.ai_service import ai_service
+from .services.executor import run_blocking
+from .services.jobs import job_store
+from .services.pregeneration import pregenerator
+from .services.telemetry import HTTP_SECONDS, Gauge, finish_request, registry, start_request
+from .services.warmup import warmup
 
-app = FastAPI(title="Samsung Health AI Dashboard API")
+# Send a Server-Timing header with every response (otherwise only when the
+# request carries X-Server-Timing)
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+API_PREFIX = "/api"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse the report files in the background; the server accepts requests meanwhile
+    warmup.start(endpoints.data_loader)
+    # Load the model into Ollama now rather than on the first report
+    ai_service.start_preload()
+    # Regenerate the standard reports in idle time whenever their data changes
+    pregenerator.start(endpoints.data_loader)
+    yield
+    await pregenerator.stop()
+    await warmup.stop()
+    # Cancel analyses still running in the background
+    await job_store.close()
+    # Close the pooled Ollama connections
+    await ai_service.aclose()
+    # Write the sidecars of files that were appended to since their last write
+    await run_blocking(endpoints.data_loader.flush_sidecars)
+
+app = FastAPI(title="Samsung Health AI Dashboard API", lifespan=lifespan)
 
 # Configure CORS
 origins = [
@@ -16,10 +50,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Insight-Cache", "X-Queue-Position", "X-Total-Rows", "X-Next-Cursor", "Server-Timing"],
 )
 
-app.include_router(endpoints.router, prefix="/api")
+@app.middleware("http")
+async def record_timing(request: Request, call_next):
+    token = start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        server_timing = finish_request(token)
+    elapsed = time.perf_counter() - start
+    # Label by route template so /api/data/{filename} stays one series
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    if request.url.path.startswith(API_PREFIX) and route_path.startswith("/") and not route_path.startswith(API_PREFIX):
+        # Newer FastAPI versions report included routes without the router prefix
+        route_path = API_PREFIX + route_path
+    HTTP_SECONDS.observe(elapsed, method=request.method, route=route_path, status=str(response.status_code))
+    if SERVER_TIMING or "x-server-timing" in request.headers:
+        total = f"total;dur={elapsed * 1000:.2f}"
+        response.headers["Server-Timing"] = f"{server_timing}, {total}" if server_timing else total
+    return response
+
+# Cache and queue sizes, read at scrape time
+registry.register(Gauge("health_data_cache_bytes", "Bytes held by the DataLoader frame cache.",
+                        lambda: {"": endpoints.data_loader.cache.stats()["bytes"]}))
+registry.register(Gauge("health_data_cache_entries", "Frames held by the DataLoader frame cache.",
+                        lambda: {"": endpoints.data_loader.cache.stats()["entries"]}))
+registry.register(Gauge("health_insight_cache_entries", "Generations stored in the insight cache.",
+                        lambda: {"": ai_service.insight_cache.stats()["entries"]}))
+registry.register(Gauge("health_ollama_generations", "Generations by scheduler state.",
+                        lambda: {state: ai_service.scheduler.stats()[state] for state in ("running", "queued")}, label="state"))
+
+app.include_router(endpoints.router, prefix=API_PREFIX)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    """Liveness plus readiness: `ready` turns true once the report files are preloaded."""
+    return {"status": "ok", "ready": warmup.ready, "warmup": warmup.status()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the backend's counters, histograms and gauges."""
+    # Some gauges query the insight cache's SQLite file
+    return PlainTextResponse(await run_blocking(registry.render), media_type="text/plain; version=0.0.4")
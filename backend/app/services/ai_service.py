@@ -1,26 +1,152 @@
-import requests
-import pandas as pd
+import asyncio
+import httpx
 import json
-from typing import Dict, Any
+import os
+import time
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional
+from .executor import run_blocking
+from .insight_cache import InsightCache
+from .ollama_scheduler import Event, Generation, GenerationScheduler
+from .prompt_builder import compact_json, compact_prompt, compact_series, compact_summary
+from .telemetry import (
+    INSIGHT_REQUESTS, OLLAMA_CONNECT_SECONDS, OLLAMA_ERRORS, OLLAMA_EVAL_SECONDS, OLLAMA_FIRST_TOKEN_SECONDS,
+    OLLAMA_GENERATION_SECONDS, OLLAMA_LOAD_SECONDS, OLLAMA_PROMPT_EVAL_SECONDS, OLLAMA_TOKENS,
+    OLLAMA_TOKENS_PER_SECOND, count_error,
+)
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "deepseek-r1:14b" # mistral, llama3, qwq user can change this
 
+# Finished generations are cached next to the columnar data cache
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+INSIGHT_CACHE_PATH = os.environ.get("INSIGHT_CACHE_PATH", os.path.join(BASE_DIR, "cleaned", ".cache", "insights.sqlite3"))
+
+# How long a status/model-list probe is served before it is refreshed in the background
+STATUS_TTL_SECONDS = 15
+
+# How long Ollama keeps the model in memory after a request (Ollama's own
+# default is 5 minutes); "-1" keeps it loaded until Ollama stops
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Set OLLAMA_PRELOAD=0 to skip loading the model at startup
+OLLAMA_PRELOAD = os.environ.get("OLLAMA_PRELOAD", "1") != "0"
+
+# Streamed tokens are coalesced into one event per STREAM_FRAME_SECONDS or
+# STREAM_FRAME_CHARS characters, whichever is reached first
+STREAM_FRAME_SECONDS = 0.05
+STREAM_FRAME_CHARS = 512
+
+class InsightStream:
+    """Async iterator over the typed events of a generation.
+
+    Events are (kind, data) pairs: ('thinking', {"text"}) and ('response',
+    {"text"}) with coalesced tokens, ('metrics', timings) once Ollama
+    reports them and finally ('done', {"cache", "error"}). Tagged with its
+    cache status and, for live generations, the queue position the request
+    had when it was submitted (0 = started at once).
+    """
+
+    def __init__(self, events: AsyncIterator[Event], cache_status: str, queue_position: int = 0):
+        self.events = events
+        self.cache_status = cache_status
+        self.queue_position = queue_position
+
+    def __aiter__(self) -> AsyncIterator[Event]:
+        return self.events.__aiter__()
+
 class AIService:
     def __init__(self):
         self.ollama_url = OLLAMA_URL
         self.model_name = MODEL_NAME
+        self.insight_cache = InsightCache(INSIGHT_CACHE_PATH)
+        self.scheduler = GenerationScheduler()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._status: Optional[Dict[str, Any]] = None
+        self._status_checked_at = 0.0
+        self._status_refresh: Optional[asyncio.Task] = None
+        self._preload: Optional[asyncio.Task] = None
+        self.preload_state = "idle"
+        # Timings of the most recent finished generation, see generation_timings()
+        self.last_timings: Optional[Dict[str, Any]] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Keep-alive connection pool shared by every call to Ollama."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30, connect=5),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._status_refresh is not None:
+            self._status_refresh.cancel()
+        if self._preload is not None:
+            self._preload.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
-    def check_ollama_status(self) -> Dict[str, Any]:
-        """Check if Ollama is accessible and which models are available."""
+    def start_preload(self) -> None:
+        """Loads the model into Ollama in the background, so the first report doesn't wait for it."""
+        if OLLAMA_PRELOAD and self._preload is None:
+            self._preload = asyncio.create_task(self.preload())
+
+    async def preload(self) -> bool:
+        """Asks Ollama to load the model (a request without a prompt) and keep it resident."""
+        self.preload_state = "loading"
+        try:
+            response = await self.client.post(
+                self.ollama_url,
+                json={"model": self.model_name, "keep_alive": OLLAMA_KEEP_ALIVE, "stream": False},
+                timeout=httpx.Timeout(300, connect=5),
+            )
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Preloading {self.model_name} failed: {e}")
+            count_error("ollama_preload")
+            self.preload_state = "error"
+            return False
+        load_seconds = generation_timings(response.json())["load_seconds"]
+        if load_seconds is not None:
+            OLLAMA_LOAD_SECONDS.observe(load_seconds)
+        self.preload_state = "loaded"
+        return True
+
+    async def check_ollama_status(self) -> Dict[str, Any]:
+        """Check if Ollama is accessible and which models are available.
+
+        The probe result is cached for STATUS_TTL_SECONDS. A stale result is
+        still returned immediately while a single background task refreshes
+        it, so only the very first call waits on Ollama.
+        """
+        if self._status_refresh is None or self._status_refresh.done():
+            if self._status is None or time.monotonic() - self._status_checked_at > STATUS_TTL_SECONDS:
+                self._status_refresh = asyncio.create_task(self._refresh_status())
+        if self._status is None:
+            await asyncio.shield(self._status_refresh)
+        return {
+            **self._status,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "preload": self.preload_state,
+            "last_generation": self.last_timings,
+            "insight_cache": await run_blocking(self.insight_cache.stats),
+            "scheduler": self.scheduler.stats()
+        }
+
+    async def _refresh_status(self) -> None:
+        self._status = await self._probe_status()
+        self._status_checked_at = time.monotonic()
+
+    async def _probe_status(self) -> Dict[str, Any]:
         try:
             # Check connection to base URL (usually returns "Ollama is running")
             base_url = self.ollama_url.replace("/api/generate", "")
-            response = requests.get(base_url, timeout=5)
+            response = await self.client.get(base_url, timeout=5)
             is_running = response.status_code == 200
-            
+
             # Optionally check if the specific model is pulled
-            tags_response = requests.get(f"{base_url}/api/tags", timeout=5)
+            tags_response = await self.client.get(f"{base_url}/api/tags", timeout=5)
             models = []
             model_exists = False
             if tags_response.status_code == 200:
@@ -41,107 +167,243 @@ class AIService:
                 "model": self.model_name
             }
 
-    def _get_statistical_summary(self, df: pd.DataFrame) -> str:
-        """Generates a text summary based on statistics."""
-        desc = df.describe()
-        summary = "Statistical Analysis (AI Offline):\n"
-        
-        if 'count' in desc.index:
-            summary += f"- Data Points: {int(desc.iloc[0,0])}\n"
-        
+    def _get_statistical_summary(self, summary: Dict[str, Dict[str, Any]]) -> str:
+        """Generates a text summary from the per-column statistics of DataLoader.get_summary()."""
+        text = "Statistical Analysis (AI Offline):\n"
+
+        if summary:
+            text += f"- Data Points: {next(iter(summary.values()))['count']}\n"
+
         # Numeric columns analysis
-        for col in desc.columns:
-            try:
-                mean_val = desc.at['mean', col]
-                max_val = desc.at['max', col]
-                min_val = desc.at['min', col]
-                summary += f"- {col}: Avg {mean_val:.2f}, Max {max_val:.2f}, Min {min_val:.2f}\n"
-            except:
-                pass
-                
-        return summary
-
-    def analyze_data(self, filename: str, data: list, stream: bool = False):
+        for col, stats in summary.items():
+            if stats.get('mean') is not None:
+                text += f"- {col}: Avg {stats['mean']:.2f}, Max {stats['max']:.2f}, Min {stats['min']:.2f}\n"
+
+        return text
+
+    async def _ollama_events(self, payload: Dict[str, Any], timeout: float) -> AsyncIterator[Event]:
+        """Streams a generation from Ollama as (kind, value) events.
+
+        Yields ('thinking', text) for DeepSeek's native thinking field,
+        ('response', text) for answer tokens and finally ('done', stats) with
+        Ollama's closing object.
         """
-        Analyzes the provided data snippet using Local AI or Statistics.
+        request_timeout = httpx.Timeout(timeout, connect=5)
+        started = time.perf_counter()
+        first_token = None
+        try:
+            async with self.client.stream("POST", self.ollama_url, json={**payload, "stream": True}, timeout=request_timeout) as response:
+                OLLAMA_CONNECT_SECONDS.observe(time.perf_counter() - started)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        json_line = json.loads(line)
+                    except ValueError:
+                        continue
+                    if first_token is None and (json_line.get('thinking') or json_line.get('response')):
+                        first_token = time.perf_counter()
+                        OLLAMA_FIRST_TOKEN_SECONDS.observe(first_token - started)
+                    if json_line.get('thinking'):
+                        yield ('thinking', json_line['thinking'])
+                    if json_line.get('response'):
+                        yield ('response', json_line['response'])
+                    if json_line.get('done'):
+                        self._observe_generation(json_line, time.perf_counter() - started)
+                        yield ('done', json_line)
+        except Exception as e:
+            OLLAMA_ERRORS.inc(error=type(e).__name__)
+            raise
+
+    def _observe_generation(self, stats: Dict[str, Any], elapsed: float) -> None:
+        """Records the timings and token counts of Ollama's closing object."""
+        OLLAMA_GENERATION_SECONDS.observe(elapsed)
+        OLLAMA_TOKENS.inc(stats.get('prompt_eval_count') or 0, kind="prompt")
+        OLLAMA_TOKENS.inc(stats.get('eval_count') or 0, kind="eval")
+        timings = generation_timings(stats)
+        if timings["load_seconds"] is not None:
+            OLLAMA_LOAD_SECONDS.observe(timings["load_seconds"])
+        if timings["prompt_eval_seconds"] is not None:
+            OLLAMA_PROMPT_EVAL_SECONDS.observe(timings["prompt_eval_seconds"])
+        if timings["eval_seconds"] is not None:
+            OLLAMA_EVAL_SECONDS.observe(timings["eval_seconds"])
+        if timings["eval_tokens_per_second"] is not None:
+            OLLAMA_TOKENS_PER_SECOND.observe(timings["eval_tokens_per_second"])
+        self.last_timings = timings
+
+    def _submit(self, payload: Dict[str, Any], timeout: float, cache_key: str, priority: str = "interactive") -> Generation:
+        """Queues a generation with the scheduler, joining an identical one already in flight."""
+        async def run() -> AsyncIterator[Event]:
+            thinking_parts = []
+            response_parts = []
+            async for kind, value in self._ollama_events(payload, timeout):
+                if kind == 'thinking':
+                    thinking_parts.append(value)
+                elif kind == 'response':
+                    response_parts.append(value)
+                elif kind == 'done' and response_parts:
+                    await run_blocking(self.insight_cache.put, cache_key, payload["model"], "".join(thinking_parts), "".join(response_parts))
+                yield (kind, value)
+
+        return self.scheduler.submit(cache_key, run, priority)
+
+    async def _stream_events(self, events: AsyncIterator[Event], cache_status: str, on_error: Callable[[Exception], str]) -> AsyncIterator[Event]:
+        """Turns generation events into the typed, coalesced events of an InsightStream.
+
+        Consecutive thinking or response tokens are sent as one event once
+        STREAM_FRAME_CHARS characters are buffered or STREAM_FRAME_SECONDS
+        passed since the first of them, also while Ollama is stalled. Errors
+        are reported through `on_error` as a last response event, since the
+        HTTP status has already been sent.
         """
-        # Convert list of dicts to string summary for the prompt
-        df = pd.DataFrame(data)
-        
-        # Check if we should try Ollama
+        iterator = events.__aiter__()
+        kind: Optional[str] = None
+        parts: List[str] = []
+        size = 0
+        deadline = 0.0
+        error = None
+        pending: Optional[asyncio.Task] = None
         try:
-            # Construct Prompt
-            data_summary = df.describe().to_string()
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                if parts:
+                    done, _ = await asyncio.wait({pending}, timeout=max(0.0, deadline - time.monotonic()))
+                    if not done:
+                        # Nothing arrived in time: send what is buffered
+                        yield (kind, {"text": "".join(parts)})
+                        parts, size = [], 0
+                        continue
+                try:
+                    event_kind, value = await pending
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+                if event_kind in ('thinking', 'response'):
+                    if parts and event_kind != kind:
+                        yield (kind, {"text": "".join(parts)})
+                        parts, size = [], 0
+                    if not parts:
+                        deadline = time.monotonic() + STREAM_FRAME_SECONDS
+                    kind = event_kind
+                    parts.append(value)
+                    size += len(value)
+                    if size >= STREAM_FRAME_CHARS:
+                        yield (kind, {"text": "".join(parts)})
+                        parts, size = [], 0
+                elif event_kind == 'done':
+                    if parts:
+                        yield (kind, {"text": "".join(parts)})
+                        parts, size = [], 0
+                    if value:
+                        yield ('metrics', generation_timings(value))
+        except Exception as e:
+            if parts:
+                yield (kind, {"text": "".join(parts)})
+                parts = []
+            yield ('response', {"text": on_error(e)})
+            error = str(e) or type(e).__name__
+        finally:
+            if pending is not None:
+                pending.cancel()
+        if parts:
+            yield (kind, {"text": "".join(parts)})
+        yield ('done', {"cache": cache_status, "error": error})
+
+    async def _replay(self, cached: Dict[str, Any]) -> AsyncIterator[Event]:
+        """Replays a cached generation as the events of a live one."""
+        if cached["thinking"]:
+            yield ('thinking', cached["thinking"])
+        yield ('response', cached["response"])
+        yield ('done', {})
+
+    async def _run(self, payload: Dict[str, Any], stream: bool, timeout: float, on_error: Callable[[Exception], str], priority: str = "interactive"):
+        """Answers a generation request from the insight cache or through the scheduler.
+
+        Returns an InsightStream if `stream`, otherwise {"insight", "cache",
+        "timings"} where "cache" is "hit" or "miss". "timings" is None unless
+        a generation finished (hits, failures and preempted runs have none).
+        """
+        cache_key = InsightCache.make_key(payload["model"], payload.get("system", ""), payload["prompt"])
+        cached = await run_blocking(self.insight_cache.get, cache_key)
+        INSIGHT_REQUESTS.inc(cache="hit" if cached is not None else "miss")
+        if cached is not None:
+            if stream:
+                return InsightStream(self._stream_events(self._replay(cached), "hit", on_error), "hit")
+            return {"insight": cached["response"], "cache": "hit", "timings": None}
+
+        generation = self._submit(payload, timeout, cache_key, priority)
+        if stream:
+            return InsightStream(
+                self._stream_events(generation.subscribe(), "miss", on_error),
+                "miss",
+                self.scheduler.queue_position(generation),
+            )
+        response_parts = []
+        timings = None
+        try:
+            async for kind, value in generation.subscribe():
+                if kind == 'response':
+                    response_parts.append(value)
+                elif kind == 'done':
+                    timings = generation_timings(value)
+        except Exception as e:
+            return {"insight": on_error(e), "cache": "miss", "timings": timings}
+        return {"insight": "".join(response_parts) or 'No response from AI.', "cache": "miss", "timings": timings}
+
+    def _failed(self, message: str, stream: bool):
+        """Wraps an error message in the shape _run would have returned."""
+        if not stream:
+            return {"insight": message, "cache": "miss", "timings": None}
+
+        async def single_message():
+            yield ('response', {"text": message})
+            yield ('done', {"cache": "miss", "error": message})
+        return InsightStream(single_message(), "miss")
+
+    async def analyze_data(self, filename: str, summary: Dict[str, Dict[str, Any]], stream: bool = False):
+        """
+        Analyzes a file from its column statistics (DataLoader.get_summary) using Local AI or Statistics.
+        """
+        try:
+            # Construct Prompt: one row per statistic, one column per data column
+            data_summary = compact_summary(summary)
             system_instruction = """You are a health data analyst. 
             Identify trends, anomalies, or interesting patterns. Keep it concise (3-4 bullet points). 
             Format your response in Markdown. Do not include any salutations (e.g., 'Dear user') or signatures (e.g., 'Sincerely' or name/title at the end). Start directly with the findings."""
             
-            prompt = f"""
+            prompt = compact_prompt(f"""
             Analyze the following Samsung Health data summary for '{filename}'.
             
             Data Summary:
             {data_summary}
-            """
-            
-            payload = {
-                "model": MODEL_NAME,
-                "prompt": prompt,
-                "system": system_instruction,
-            }
-
-            if stream:
-                payload["stream"] = True
-                response = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=300)
-                response.raise_for_status()
-                
-                has_started_thinking = False
-                has_ended_thinking = False
-                
-                for line in response.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        try:
-                            json_line = json.loads(decoded_line)
-                            
-                            # Handle native 'thinking' field from Ollama/DeepSeek
-                            if 'thinking' in json_line and json_line['thinking']:
-                                if not has_started_thinking:
-                                    yield "<think>"
-                                    has_started_thinking = True
-                                yield json_line['thinking']
-                            
-                            # Handle 'response' field
-                            if 'response' in json_line and json_line['response']:
-                                if has_started_thinking and not has_ended_thinking:
-                                    yield "</think>"
-                                    has_ended_thinking = True
-                                yield json_line['response']
-                                
-                            # Ensure we close think tag if done
-                            if json_line.get('done') and has_started_thinking and not has_ended_thinking:
-                                yield "</think>"
-                                has_ended_thinking = True
-                                
-                        except:
-                            pass
-            else:
-                response = requests.post(OLLAMA_URL, json=payload, timeout=300)
-                response.raise_for_status()
-                result = response.json()
-                return result.get('response', 'No response from AI.')
-
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                return f"Note: Local AI model '{MODEL_NAME}' not found. Falling back to statistical analysis.\n\n" + self._get_statistical_summary(df)
-            return self._get_statistical_summary(df)
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            return self._get_statistical_summary(df)
+            """)
         except Exception as e:
+            return self._failed(f"Error analyzing data: {str(e)}", stream)
+
+        def on_error(e: Exception) -> str:
+            if isinstance(e, httpx.HTTPStatusError):
+                if e.response.status_code == 404:
+                    return f"Note: Local AI model '{MODEL_NAME}' not found. Falling back to statistical analysis.\n\n" + self._get_statistical_summary(summary)
+                return self._get_statistical_summary(summary)
+            if isinstance(e, (httpx.ConnectError, httpx.TimeoutException)):
+                return self._get_statistical_summary(summary)
             return f"Error analyzing data: {str(e)}"
 
-    def analyze_heart_rate_advanced(self, data: Dict[str, Any], period_name: str, stream: bool = False):
+        payload = {
+            "model": MODEL_NAME,
+            "prompt": prompt,
+            "system": compact_prompt(system_instruction),
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+        }
+        return await self._run(payload, stream, 300, on_error)
+
+    async def analyze_heart_rate_advanced(self, data: Dict[str, Any], period_name: str, stream: bool = False, priority: str = "interactive"):
         """
         Performs advanced analysis on heart rate data including resting HR and HRV.
+        `priority="background"` yields the model to interactive requests (see GenerationScheduler).
         """
         try:
             period_map = {"week": "7 days", "month": "30 days", "90d": "90 days", "180d": "180 days"}
@@ -163,7 +425,7 @@ class AIService:
             
             Format your response in Markdown. Do not include any salutations (e.g., 'Dear User') or signatures (e.g., 'Professionally, [Your Name]' or your title/specialty at the end). Start the report directly with the content."""
             
-            prompt = f"""
+            prompt = compact_prompt(f"""
             Analyze the following Samsung Health heart rate data for this {display_period} report.
             
             Metrics summary:
@@ -172,8 +434,9 @@ class AIService:
             - Maximum Heart Rate: {hr_max.get('value', 0):.1f} bpm (Trend: {hr_max.get('trend', 0):+.1f}%)
             - Average HRV: {hrv.get('value', 0):.1f} ms (Trend: {hrv.get('trend', 0):+.1f}%)
             
-            Daily Average Trend (Last 30 entries):
-            {json.dumps(data.get('hr_metrics', [])[-30:])}
+            Daily Average Trend:
+            {compact_series(data.get('hr_metrics', []), ['heart_rate'])}
+            Trend analysis (LOESS, per metric): {compact_json(data.get('trends', {}), 2)}
             
             Please provide:
             1. An assessment of overall cardiovascular health.
@@ -183,62 +446,22 @@ class AIService:
             5. Personalized lifestyle recommendations.
             
             Keep it professional, encouraging, and scientifically grounded. Use German if the user's data or language suggests it.
-            """
-            
-            print(f"DEBUG: Sending prompt for {display_period} to Ollama")
-            
-            payload = {
-                "model": MODEL_NAME,
-                "prompt": prompt,
-                "system": system_instruction,
-            }
-
-            if stream:
-                payload["stream"] = True
-                response = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=600)
-                response.raise_for_status()
-                
-                has_started_thinking = False
-                has_ended_thinking = False
-                
-                for line in response.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        try:
-                            json_line = json.loads(decoded_line)
-                            
-                            # Handle native 'thinking' field
-                            if 'thinking' in json_line and json_line['thinking']:
-                                if not has_started_thinking:
-                                    yield "<think>"
-                                    has_started_thinking = True
-                                yield json_line['thinking']
-
-                            # Handle 'response' field
-                            if 'response' in json_line and json_line['response']:
-                                if has_started_thinking and not has_ended_thinking:
-                                    yield "</think>"
-                                    has_ended_thinking = True
-                                yield json_line['response']
-
-                            # Ensure we close think tag if done
-                            if json_line.get('done') and has_started_thinking and not has_ended_thinking:
-                                yield "</think>"
-                                has_ended_thinking = True
-                        except:
-                            pass
-            else:
-                response = requests.post(OLLAMA_URL, json=payload, timeout=600)
-                response.raise_for_status()
-                result = response.json()
-                return result.get('response', 'No response from AI.')
-
+            """)
         except Exception as e:
-            return f"Error in advanced heart rate analysis: {str(e)}"
+            return self._failed(f"Error in advanced heart rate analysis: {str(e)}", stream)
 
-    def analyze_sleep_advanced(self, data: Dict[str, Any], period_name: str, stream: bool = False):
+        payload = {
+            "model": MODEL_NAME,
+            "prompt": prompt,
+            "system": compact_prompt(system_instruction),
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+        }
+        return await self._run(payload, stream, 600, lambda e: f"Error in advanced heart rate analysis: {str(e)}", priority)
+
+    async def analyze_sleep_advanced(self, data: Dict[str, Any], period_name: str, stream: bool = False, priority: str = "interactive"):
         """
         Performs advanced analysis on sleep data including heart rate, SpO2 and HRV.
+        `priority="background"` yields the model to interactive requests (see GenerationScheduler).
         """
         try:
             period_map = {"week": "7 days", "month": "30 days", "90d": "90 days", "180d": "180 days"}
@@ -260,18 +483,19 @@ class AIService:
             
             Format your response in Markdown. Do not include any salutations (e.g., 'Dear User') or signatures (e.g., 'Best regards, Dr. Sleep' or personal names/titles at the end). Start the report directly with the analysis."""
             
-            prompt = f"""
+            prompt = compact_prompt(f"""
             Analyze the following Samsung Health sleep data for this {display_period} report.
             
             Metrics summary:
             - Avg Sleep duration: {duration.get('value', 0) / 60 if duration.get('value') else 0:.1f} hours
-            - Sleep Phases (Total min): {json.dumps(data.get('stages_summary', {}))}
+            - Sleep Phases (Total min): {compact_json(data.get('stages_summary', {}), 0)}
             - Avg Heart Rate: {hr.get('value', 0) if hr.get('value') else 0:.1f} bpm (Min: {hr.get('min', 0) if hr.get('min') else 0:.1f})
             - Avg SpO2 (Oxygen): {spo2.get('value', 0) if spo2.get('value') else 0:.1f}% (Min: {spo2.get('min', 0) if spo2.get('min') else 0:.1f}%)
             - Avg HRV (Recovery): {hrv.get('value', 0) if hrv.get('value') else 0:.1f} ms
             
-            Sleep Trend (Last 30 entries):
-            {json.dumps(data.get('sleep_metrics', [])[-30:])}
+            Sleep Trend:
+            {compact_series(data.get('sleep_metrics', []), ['sleep_score', 'efficiency', 'sleep_duration', 'physical_recovery', 'mental_recovery'])}
+            Trend analysis (LOESS, per metric): {compact_json(data.get('trends', {}), 2)}
             
             Please provide:
             1. A summary of sleep quality and consistency.
@@ -281,55 +505,42 @@ class AIService:
             5. Concrete recommendations for improvement.
             
             Keep it professional and insightful.
-            """
-            
-            payload = {
-                "model": MODEL_NAME,
-                "prompt": prompt,
-                "system": system_instruction,
-            }
+            """)
+        except Exception as e:
+            return self._failed(f"Error in advanced sleep analysis: {str(e)}", stream)
 
-            if stream:
-                payload["stream"] = True
-                response = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=600)
-                response.raise_for_status()
-                
-                has_started_thinking = False
-                has_ended_thinking = False
-                
-                for line in response.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        try:
-                            json_line = json.loads(decoded_line)
-                            
-                            # Handle native 'thinking' field
-                            if 'thinking' in json_line and json_line['thinking']:
-                                if not has_started_thinking:
-                                    yield "<think>"
-                                    has_started_thinking = True
-                                yield json_line['thinking']
-
-                            # Handle 'response' field
-                            if 'response' in json_line and json_line['response']:
-                                if has_started_thinking and not has_ended_thinking:
-                                    yield "</think>"
-                                    has_ended_thinking = True
-                                yield json_line['response']
-
-                            # Ensure we close think tag if done
-                            if json_line.get('done') and has_started_thinking and not has_ended_thinking:
-                                yield "</think>"
-                                has_ended_thinking = True
-                        except:
-                            pass
-            else:
-                response = requests.post(OLLAMA_URL, json=payload, timeout=600)
-                response.raise_for_status()
-                result = response.json()
-                return result.get('response', 'No response from AI.')
+        payload = {
+            "model": MODEL_NAME,
+            "prompt": prompt,
+            "system": compact_prompt(system_instruction),
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+        }
+        return await self._run(payload, stream, 600, lambda e: f"Error in advanced sleep analysis: {str(e)}", priority)
 
-        except Exception as e:
-            return f"Error in advanced sleep analysis: {str(e)}"
+def generation_timings(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Splits Ollama's closing object into model load, prompt evaluation and generation.
+
+    Ollama reports durations in nanoseconds; missing fields (e.g. a prompt
+    served from Ollama's own cache has no prompt_eval_duration) become None.
+    """
+    def seconds(key: str) -> Optional[float]:
+        value = stats.get(key)
+        return round(value / 1e9, 3) if value else None
+
+    def rate(count_key: str, duration_key: str) -> Optional[float]:
+        if stats.get(count_key) and stats.get(duration_key):
+            return round(stats[count_key] / (stats[duration_key] / 1e9), 2)
+        return None
+
+    return {
+        "load_seconds": seconds('load_duration'),
+        "prompt_tokens": stats.get('prompt_eval_count'),
+        "prompt_eval_seconds": seconds('prompt_eval_duration'),
+        "prompt_tokens_per_second": rate('prompt_eval_count', 'prompt_eval_duration'),
+        "eval_tokens": stats.get('eval_count'),
+        "eval_seconds": seconds('eval_duration'),
+        "eval_tokens_per_second": rate('eval_count', 'eval_duration'),
+        "total_seconds": seconds('total_duration'),
+    }
 
 ai_service = AIService()
@@ -1,42 +1,602 @@
 import pandas as pd
+import numpy as np
 import os
-from typing import Dict, Any
+import io
+import json
+import hashlib
+import threading
+import time
+from typing import Dict, Any, Optional, Sequence, Tuple
+from .frame_cache import FrameCache
+from .metrics import MetricEngine, calc_trend
+from .telemetry import count_error, span, timed
+from .summary import ColumnSummary, describe_summaries, merge_summaries, summarize
+from .trends import summarize_trends, trend_records
+
+# Columnar sidecars live in a hidden folder inside the data directory so that
+# get_all_data_files() keeps listing only the source CSVs.
+CACHE_DIR_NAME = ".cache"
+
+# Candidate timestamp columns, in order of preference. Frames are kept sorted on
+# the first one present so that time windows can be sliced by binary search.
+TIME_COLUMNS = ['create_time', 'start_time', 'time']
+
+# Bucket sizes of the rollup tables and the statistics kept per numeric column.
+# All of them combine by plain addition / min / max, so any range of buckets
+# can be merged into exact count, mean, min, max and variance.
+ROLLUP_FREQS = {'hour': 'h', 'day': 'D'}
+ROLLUP_STATS = ['count', 'sum', 'min', 'max', 'sumsq']
+
+# Text columns with at most this share of distinct values are stored as
+# categoricals (sleep stages, device ids, ...).
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Bytes hashed at the start and at the end of the already ingested part of a
+# file, plus FINGERPRINT_SAMPLES evenly spaced blocks in between, to tell an
+# append (prefix unchanged) from a rewrite. Edits that grow the file and only
+# touch bytes outside the hashed blocks still pass for an append; catching
+# those would mean hashing the whole file on every change.
+FINGERPRINT_BYTES = 64 * 1024
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_SAMPLE_BYTES = 4 * 1024
+
+# After an append the sidecar is rewritten at most this often per file; the
+# last version is written by flush_sidecars() at shutdown. A stale sidecar
+# only means the rows appended since are parsed again on the next cold start.
+SIDECAR_WRITE_INTERVAL_SECONDS = float(os.environ.get("SIDECAR_WRITE_INTERVAL_SECONDS", 300))
+
+class CacheEntry:
+    """A parsed source file together with the tables derived from it.
+
+    `offset` is the number of source bytes ingested into `frame` (the file
+    size at the time), `fingerprint` the hash of that prefix and `last_time`
+    the newest timestamp seen, which is what an append is checked against.
+    """
+
+    def __init__(self, signature: Tuple[int, int], frame: pd.DataFrame, fingerprint: Optional[str] = None):
+        self.signature = signature
+        self.frame = frame
+        self.fingerprint = fingerprint
+        self.last_time = None
+        time_col = next((c for c in TIME_COLUMNS if c in frame.columns), None)
+        if time_col and pd.api.types.is_datetime64_any_dtype(frame[time_col]):
+            self.last_time = frame[time_col].max()
+        # freq -> column -> rollup table, built on first use
+        self.rollups: Dict[str, Dict[str, pd.DataFrame]] = {}
+        # column -> mergeable statistics, built on first use
+        self.summary: Optional[Dict[str, ColumnSummary]] = None
+
+    @property
+    def offset(self) -> int:
+        return self.signature[1]
+
+    def nbytes(self) -> int:
+        """Memory held by the frame and its rollups."""
+        size = int(self.frame.memory_usage(deep=True).sum())
+        # Copied: rollups may be added by another thread while the entry is weighed
+        for tables in list(self.rollups.values()):
+            size += sum(int(t.memory_usage().sum()) for t in tables.values())
+        summary = self.summary
+        if summary is not None:
+            size += sum(column.nbytes() for column in summary.values())
+        return size
 
 class DataLoader:
     def __init__(self, data_dir: str):
         self.data_dir = data_dir
-        self.cache: Dict[str, pd.DataFrame] = {}
+        self.cache_dir = os.path.join(data_dir, CACHE_DIR_NAME)
+        self.cache: FrameCache[CacheEntry] = FrameCache(CacheEntry.nbytes)
+        self.metrics = MetricEngine(self)
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._file_locks_guard = threading.Lock()
+        # filename -> monotonic time of its last sidecar write
+        self._sidecar_written: Dict[str, float] = {}
+        # Files whose cached entry is newer than their sidecar
+        self._sidecar_pending: set = set()
 
     def load_csv(self, filename: str) -> pd.DataFrame:
-        """Loads a CSV file into a pandas DataFrame, with caching."""
-        if filename in self.cache:
-            return self.cache[filename]
-        
+        """Loads a CSV file into a pandas DataFrame, with caching.
+
+        Both the in-memory cache and the Parquet sidecar are keyed on the
+        source file's mtime and size. When the file changed only by having
+        rows appended, just the new tail is parsed and merged; a rewritten
+        file is re-read in full.
+        """
+        return self._get_entry(filename).frame
+
+    def _get_entry(self, filename: str) -> CacheEntry:
         file_path = os.path.join(self.data_dir, filename)
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
-        
+
+        signature = self._source_signature(file_path)
+        entry = self.cache.get(filename)
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        # Single flight: one thread (re)loads the file while concurrent callers
+        # wait here and then pick its result up from the cache
+        with self._file_lock(filename):
+            signature = self._source_signature(file_path)
+            entry = self.cache.get(filename)
+            if entry is not None and entry.signature == signature:
+                return entry
+            return self._load_entry(filename, file_path, signature, entry)
+
+    def _file_lock(self, filename: str) -> threading.Lock:
+        with self._file_locks_guard:
+            return self._file_locks.setdefault(filename, threading.Lock())
+
+    def _load_entry(self, filename: str, file_path: str, signature: Tuple[int, int], entry: Optional[CacheEntry]) -> CacheEntry:
+        """Builds the entry of the current file version from the cached one, the sidecar or the CSV.
+
+        Always produces a new entry, so readers still holding the previous
+        one are unaffected by the refresh.
+        """
+        try:
+            if entry is None:
+                entry = self._read_columnar(filename)
+            if entry is not None and entry.signature != signature:
+                entry = self._ingest_appended(filename, file_path, entry, signature)
+                if entry is not None:
+                    self._write_columnar_throttled(filename, entry)
+            if entry is None:
+                df = self._parse_csv(file_path)
+                with span("load.sort"):
+                    df = self._sort_on_time(df)
+                with span("load.compact"):
+                    df = self._compact(df)
+                entry = CacheEntry(signature, df, self._fingerprint(file_path, signature[1]))
+                self._write_columnar(filename, entry)
+
+            self.cache.put(filename, entry)
+            return entry
+        except Exception as e:
+            raise RuntimeError(f"Error loading {filename}: {e}")
+
+    def file_version(self, filename: str) -> Tuple[int, int]:
+        """Signature of the loaded version of a file; changes whenever its data does."""
+        return self._get_entry(filename).signature
+
+    def _fingerprint(self, file_path: str, length: int) -> str:
+        """Hash of the first and last FINGERPRINT_BYTES and of sampled blocks in between of the file's first `length` bytes."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            digest.update(f.read(min(length, FINGERPRINT_BYTES)))
+            for i in range(1, FINGERPRINT_SAMPLES + 1):
+                f.seek(length * i // (FINGERPRINT_SAMPLES + 1))
+                digest.update(f.read(min(FINGERPRINT_SAMPLE_BYTES, length - f.tell())))
+            f.seek(max(0, length - FINGERPRINT_BYTES))
+            digest.update(f.read(min(length, FINGERPRINT_BYTES)))
+        return digest.hexdigest()
+
+    def _ingest_appended(self, filename: str, file_path: str, entry: CacheEntry, signature: Tuple[int, int]) -> Optional[CacheEntry]:
+        """Extends `entry` with the rows appended to the file since it was read.
+
+        Returns None when the file was rewritten rather than appended to, so
+        the caller falls back to a full parse: it did not grow (a changed
+        mtime at the same size is an edit in place), the ingested part no
+        longer ends a row, or its fingerprint changed.
+        """
+        if entry.fingerprint is None or signature[1] <= entry.offset:
+            return None
         try:
-            df = pd.read_csv(file_path)
-            # Basic cleaning: convert columns with 'time' or 'date' to datetime objects if possible
+            if self._fingerprint(file_path, entry.offset) != entry.fingerprint:
+                return None
+            with open(file_path, 'rb') as f:
+                header = f.readline()
+                f.seek(entry.offset - 1)
+                if f.read(1) != b"\n":
+                    return None
+                tail = f.read(signature[1] - entry.offset)
+
+            frame = entry.frame
+            new_rows = None
+            if tail.strip():
+                new_rows = self._parse_csv(io.BytesIO(header + tail))
+                if list(new_rows.columns) != list(frame.columns):
+                    return None
+                with span("load.append"):
+                    frame = self._append_rows(frame, new_rows, entry.last_time)
+
+            appended = CacheEntry(signature, frame, self._fingerprint(file_path, signature[1]))
+            for freq, tables in entry.rollups.items():
+                if new_rows is None:
+                    appended.rollups[freq] = tables
+                else:
+                    delta = self._aggregate_buckets(new_rows, list(tables), ROLLUP_FREQS[freq])
+                    appended.rollups[freq] = {col: self._merge_buckets(table, delta[col]) for col, table in tables.items()}
+            if entry.summary is not None:
+                try:
+                    appended.summary = entry.summary if new_rows is None else merge_summaries(entry.summary, summarize(new_rows))
+                except ValueError:
+                    # A column changed its type: rebuilt from the whole frame on next use
+                    appended.summary = None
+            return appended
+        except Exception as e:
+            count_error("incremental_load")
+            print(f"Incremental load of {filename} failed, reloading it in full: {e}")
+            return None
+
+    def _append_rows(self, frame: pd.DataFrame, new_rows: pd.DataFrame, last_time: Optional[pd.Timestamp]) -> pd.DataFrame:
+        """Concatenates parsed rows onto a cached frame, keeping it compact and sorted.
+
+        Only the new rows are compacted. Their text columns take the cached
+        frame's categories (extended by new values), so the combined columns
+        keep the frame's dtypes without rescanning it.
+        """
+        frame, new_rows = self._conform_categories(frame, self._compact(new_rows))
+        combined = pd.concat([frame, new_rows], ignore_index=True)
+        time_col = self.get_time_column(new_rows)
+        in_order = (
+            time_col is not None
+            and last_time is not None
+            and new_rows[time_col].is_monotonic_increasing
+            and new_rows[time_col].iloc[0] >= last_time
+        )
+        return combined if in_order else self._sort_on_time(combined)
+
+    def _conform_categories(self, frame: pd.DataFrame, new_rows: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Gives the categorical columns of both frames the same categories, so concat keeps them categorical."""
+        frame_cols, new_cols = {}, {}
+        for col in frame.columns:
+            if not isinstance(frame[col].dtype, pd.CategoricalDtype):
+                continue
+            values = new_rows[col]
+            if not (isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+                continue
+            known = frame[col].cat.categories
+            seen = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else pd.Index(values.dropna().unique())
+            extra = seen.difference(known, sort=False)
+            if len(extra):
+                frame_cols[col] = frame[col].cat.add_categories(extra)
+            dtype = frame_cols[col].dtype if col in frame_cols else frame[col].dtype
+            new_cols[col] = values.astype(object).astype(dtype) if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(dtype)
+        if frame_cols:
+            frame = frame.assign(**frame_cols)
+        return frame, new_rows.assign(**new_cols) if new_cols else new_rows
+
+    def _merge_buckets(self, table: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+        """Adds the rollup buckets of newly ingested rows to an existing rollup table."""
+        merged = pd.concat([table, delta]).groupby(level=0).agg(
+            {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'sumsq': 'sum'}
+        )
+        return merged[ROLLUP_STATS]
+
+    def _source_signature(self, file_path: str) -> Tuple[int, int]:
+        """Returns (mtime_ns, size) used to detect a changed source file."""
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _parse_csv(self, source) -> pd.DataFrame:
+        with span("load.read_csv"):
+            df = pd.read_csv(source)
+        # Basic cleaning: convert columns with 'time' or 'date' to datetime objects if possible
+        with span("load.datetime"):
             for col in df.columns:
                 if 'time' in col.lower() or 'date' in col.lower():
                     try:
                         df[col] = pd.to_datetime(df[col])
                     except (ValueError, TypeError):
                         pass # Keep as is if conversion fails
+        return df
+
+    def _compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Shrinks a frame's dtypes without changing any value.
+
+        Integers get the smallest integer type that holds them, floats become
+        float32 only where every value round-trips exactly, and repetitive
+        text columns become categoricals.
+        """
+        converted = {}
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                downcast = pd.to_numeric(series, downcast='integer')
+                if downcast.dtype != series.dtype:
+                    converted[col] = downcast
+            elif series.dtype == np.float64:
+                as_float32 = series.astype(np.float32)
+                if np.array_equal(as_float32.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+                    converted[col] = as_float32
+            elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                if len(series) and series.nunique(dropna=True) <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+                    converted[col] = series.astype('category')
+        return df.assign(**converted) if converted else df
+
+    def _sort_on_time(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Sorts a frame on its time column (no-op for already sorted frames)."""
+        time_col = self.get_time_column(df)
+        if time_col and pd.api.types.is_datetime64_any_dtype(df[time_col]) and not df[time_col].is_monotonic_increasing:
+            df = df.sort_values(time_col, kind='stable', na_position='last').reset_index(drop=True)
+        return df
+
+    def get_time_column(self, df: pd.DataFrame) -> Optional[str]:
+        """Returns the column a frame is indexed on, or None if it has no timestamps."""
+        return next((c for c in TIME_COLUMNS if c in df.columns), None)
+
+    def fetch_range(self, filename: str, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Returns the rows with start <= time < end (either bound may be open).
+
+        Cached frames are sorted on their time column at load, so the window is
+        located with two binary searches instead of full-length boolean masks.
+        Files without a time column are returned unfiltered.
+        """
+        df, lo, hi = self.window_bounds(filename, start, end)
+        return df.iloc[lo:hi]
 
-            self.cache[filename] = df
-            return df
+    def window_bounds(self, filename: str, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> Tuple[pd.DataFrame, int, int]:
+        """Returns the cached frame and the row positions [lo, hi) of fetch_range()'s window."""
+        df = self.load_csv(filename)
+        time_col = self.get_time_column(df)
+        if not time_col or (start is None and end is None):
+            return df, 0, len(df)
+        times = df[time_col]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            raise TypeError(f"Column '{time_col}' in {filename} is not a datetime column")
+        with span("filter"):
+            lo = times.searchsorted(start, side='left') if start is not None else 0
+            hi = times.searchsorted(end, side='left') if end is not None else len(times)
+        return df, int(lo), int(hi)
+
+    def get_rollup(self, filename: str, freq: str = 'day') -> Dict[str, pd.DataFrame]:
+        """Returns the hourly ('hour') or daily ('day') rollup of a file.
+
+        Maps every numeric column to a frame indexed by bucket start with
+        count, sum, min, max and sumsq columns. The tables are built once per
+        version of the source file and kept on its cache entry.
+        """
+        entry = self._get_entry(filename)
+        rollup = entry.rollups.get(freq)
+        if rollup is not None:
+            return rollup
+        with self._file_lock(filename):
+            # Built by a concurrent caller while we waited
+            rollup = entry.rollups.get(freq)
+            if rollup is None:
+                time_col = self.get_time_column(entry.frame)
+                if not time_col or not pd.api.types.is_datetime64_any_dtype(entry.frame[time_col]):
+                    raise TypeError(f"{filename} has no datetime column to roll up")
+                numeric_cols = list(entry.frame.select_dtypes(include='number').columns)
+                with span("rollup.groupby"):
+                    rollup = self._aggregate_buckets(entry.frame, numeric_cols, ROLLUP_FREQS[freq])
+                entry.rollups[freq] = rollup
+        self.cache.resize(filename)
+        return rollup
+
+    def _aggregate_buckets(self, df: pd.DataFrame, columns: Sequence[str], freq_alias: str) -> Dict[str, pd.DataFrame]:
+        """Groups raw samples into time buckets with the ROLLUP_STATS of each column."""
+        time_col = self.get_time_column(df)
+        values = df[list(columns)]
+        # Sums are accumulated in float64 whatever the stored (compacted) dtype
+        floats = values.astype(float)
+        buckets = df[time_col].dt.floor(freq_alias).rename('bucket')
+        grouped = values.groupby(buckets)
+        parts = {
+            'count': grouped.count(),
+            'sum': floats.groupby(buckets).sum(),
+            'min': grouped.min(),
+            'max': grouped.max(),
+            'sumsq': (floats ** 2).groupby(buckets).sum(),
+        }
+        return {col: pd.DataFrame({stat: parts[stat][col] for stat in ROLLUP_STATS}) for col in columns}
+
+    def _bucket_stats(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> Optional[Dict[str, float]]:
+        """ROLLUP_STATS of the raw samples in [start, end), or None if there are none."""
+        values = self.fetch_range(filename, start, end)[column].to_numpy(dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return None
+        return {
+            'count': values.size,
+            'sum': values.sum(),
+            'min': values.min(),
+            'max': values.max(),
+            'sumsq': np.dot(values, values),
+        }
+
+    def _range_parts(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp, freq: str) -> Tuple[pd.DataFrame, list]:
+        """Splits [start, end) into whole rollup buckets and partial edge buckets.
+
+        Returns the slice of the rollup table covering the whole buckets and a
+        list of (bucket start, stats) for the partial buckets at either edge,
+        which are the only samples that still have to be read raw.
+        """
+        alias = ROLLUP_FREQS[freq]
+        rollup = self.get_rollup(filename, freq)[column]
+        inner_start, inner_end = start.ceil(alias), end.floor(alias)
+        if inner_start >= inner_end:
+            # No whole bucket inside: at most the two partial buckets around one boundary
+            inner = rollup.iloc[0:0]
+            segments = [(start, inner_start), (inner_start, end)] if inner_start < end else [(start, end)]
+        else:
+            lo = rollup.index.searchsorted(inner_start, side='left')
+            hi = rollup.index.searchsorted(inner_end, side='left')
+            inner = rollup.iloc[lo:hi]
+            segments = [(start, inner_start), (inner_end, end)]
+
+        edges = []
+        for seg_start, seg_end in segments:
+            if seg_start < seg_end:
+                stats = self._bucket_stats(filename, column, seg_start, seg_end)
+                if stats is not None:
+                    edges.append((seg_start.floor(alias), stats))
+        return inner, edges
+
+    def rollup_range(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp, freq: str = 'day') -> pd.DataFrame:
+        """Per-bucket count/sum/min/max/sumsq of `column` for start <= time < end.
+
+        Buckets that lie entirely inside the window are read from the rollup
+        table; only the partial buckets at either edge are aggregated from raw
+        samples, so the result is exact for arbitrary bounds.
+        """
+        inner, edges = self._range_parts(filename, column, start, end, freq)
+        if not edges:
+            return inner
+        edge_frame = pd.DataFrame([stats for _, stats in edges], index=pd.DatetimeIndex([b for b, _ in edges], name=inner.index.name))
+        return pd.concat([inner, edge_frame]).sort_index()
+
+    def daily_series(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """Daily buckets of `column` in the window (days without samples omitted), plus a mean column."""
+        daily = self.rollup_range(filename, column, start, end, 'day')
+        daily = daily[daily['count'] > 0]
+        return daily.assign(mean=daily['sum'] / daily['count'])
+
+    def window_stats(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, Any]:
+        """count, mean, min, max and std of `column` for start <= time < end, merged from rollup buckets."""
+        inner, edges = self._range_parts(filename, column, start, end, 'day')
+        inner = inner[inner['count'] > 0]
+        count = int(inner['count'].sum()) + sum(stats['count'] for _, stats in edges)
+        if count == 0:
+            return {"count": 0, "mean": None, "min": None, "max": None, "std": None}
+        total = float(inner['sum'].sum()) + sum(stats['sum'] for _, stats in edges)
+        sumsq = float(inner['sumsq'].sum()) + sum(stats['sumsq'] for _, stats in edges)
+        mins = [stats['min'] for _, stats in edges]
+        maxs = [stats['max'] for _, stats in edges]
+        if not inner.empty:
+            mins.append(inner['min'].min())
+            maxs.append(inner['max'].max())
+        mean = total / count
+        std = None
+        if count > 1:
+            std = float(np.sqrt(max((sumsq - count * mean * mean) / (count - 1), 0.0)))
+        return {"count": count, "mean": mean, "min": float(min(mins)), "max": float(max(maxs)), "std": std}
+
+    def join_intervals(
+        self,
+        sessions: pd.DataFrame,
+        samples: pd.DataFrame,
+        value_col: str,
+        start_col: str = 'start_time',
+        end_col: str = 'end_time',
+        percentiles: Sequence[float] = (0.05, 0.5, 0.95),
+    ) -> pd.DataFrame:
+        """Per-session statistics of `value_col` over samples with start <= time <= end.
+
+        `samples` must be sorted on its time column (every frame returned by
+        fetch_range is). Session bounds are located with searchsorted and the
+        matching sample positions gathered in one pass, so the cost is
+        O(sessions * log(samples) + matched samples) rather than one mask over
+        all samples per session. Returns one row per session, aligned with
+        `sessions.index`: count, mean, min, max and p<NN> percentile columns.
+        Sessions without samples have count 0 and NaN statistics.
+        """
+        pct_cols = [f"p{round(q * 100):g}" for q in percentiles]
+        columns = ['count', 'mean', 'min', 'max'] + pct_cols
+        empty = pd.DataFrame(np.nan, index=sessions.index, columns=columns)
+        empty['count'] = 0
+        time_col = self.get_time_column(samples)
+        if sessions.empty or samples.empty or not time_col or value_col not in samples.columns:
+            return empty
+
+        times = samples[time_col].to_numpy(dtype='datetime64[ns]')
+        values = pd.to_numeric(samples[value_col], errors='coerce').to_numpy(dtype=float)
+        starts = pd.to_datetime(sessions[start_col]).to_numpy(dtype='datetime64[ns]')
+        ends = pd.to_datetime(sessions[end_col]).to_numpy(dtype='datetime64[ns]')
+
+        with span("join"):
+            lo = np.searchsorted(times, starts, side='left')
+            hi = np.searchsorted(times, ends, side='right')
+            counts = np.where(np.isnat(starts) | np.isnat(ends), 0, np.clip(hi - lo, 0, None))
+            if not counts.any():
+                return empty
+
+            # Flatten every session's [lo, hi) slice into one array of sample positions
+            session_ids = np.repeat(np.arange(len(sessions)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            positions = np.repeat(lo, counts) + offsets
+
+            grouped = pd.Series(values[positions]).groupby(session_ids)
+            stats = grouped.agg(['count', 'mean', 'min', 'max'])
+            if len(percentiles):
+                quantiles = grouped.quantile(list(percentiles)).unstack()
+                quantiles.columns = pct_cols
+                stats = stats.join(quantiles)
+
+            result = stats.reindex(np.arange(len(sessions)), columns=columns)
+            result['count'] = result['count'].fillna(0).astype(int)
+            result.index = sessions.index
+            return result
+
+    def _columnar_paths(self, filename: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, filename)
+        return f"{base}.parquet", f"{base}.meta.json"
+
+    def _read_columnar(self, filename: str) -> Optional[CacheEntry]:
+        """Reads the Parquet sidecar together with the source version it was built from.
+
+        The entry may be stale; _get_entry() compares its signature with the
+        source file and ingests appended rows or discards it.
+        """
+        data_path, meta_path = self._columnar_paths(filename)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with span("load.sidecar_read"):
+                df = pd.read_parquet(data_path)
+            df = self._compact(self._sort_on_time(df))
+            return CacheEntry((meta["mtime_ns"], meta["size"]), df, meta.get("fingerprint"))
+        except (OSError, ValueError, KeyError, ImportError):
+            # Missing/corrupt sidecar or no Parquet engine installed: fall back to the CSV
+            return None
+
+    def _write_columnar_throttled(self, filename: str, entry: CacheEntry) -> None:
+        """_write_columnar() unless the file's sidecar was written less than SIDECAR_WRITE_INTERVAL_SECONDS ago."""
+        last = self._sidecar_written.get(filename)
+        if last is not None and time.monotonic() - last < SIDECAR_WRITE_INTERVAL_SECONDS:
+            self._sidecar_pending.add(filename)
+            return
+        self._write_columnar(filename, entry)
+
+    def flush_sidecars(self) -> None:
+        """Writes the sidecars that _write_columnar_throttled() held back."""
+        for filename in list(self._sidecar_pending):
+            with self._file_lock(filename):
+                entry = self.cache.get(filename)
+                if entry is not None and filename in self._sidecar_pending:
+                    self._write_columnar(filename, entry)
+
+    def _write_columnar(self, filename: str, entry: CacheEntry) -> None:
+        """Writes the Parquet sidecar; failures only cost the next cold start."""
+        self._sidecar_written[filename] = time.monotonic()
+        self._sidecar_pending.discard(filename)
+        data_path, meta_path = self._columnar_paths(filename)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{data_path}.tmp"
+            with span("load.sidecar_write"):
+                entry.frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, data_path)
+            # Metadata is written last so a half-written sidecar is never trusted
+            with open(f"{meta_path}.tmp", "w") as f:
+                json.dump({"mtime_ns": entry.signature[0], "size": entry.signature[1], "fingerprint": entry.fingerprint}, f)
+            os.replace(f"{meta_path}.tmp", meta_path)
         except Exception as e:
-            raise RuntimeError(f"Error loading {filename}: {e}")
+            count_error("sidecar_write")
+            print(f"Columnar cache write failed for {filename}: {e}")
 
+    def column_summaries(self, filename: str) -> Dict[str, ColumnSummary]:
+        """Per-column ColumnSummary of a file, built once per version and merged on appends."""
+        entry = self._get_entry(filename)
+        summary = entry.summary
+        if summary is not None:
+            return summary
+        with self._file_lock(filename):
+            summary = entry.summary
+            if summary is None:
+                with span("summary.build"):
+                    summary = summarize(entry.frame)
+                entry.summary = summary
+        self.cache.resize(filename)
+        return summary
+
+    @timed("summary")
     def get_summary(self, filename: str) -> Dict[str, Any]:
-        """Returns a simple statistical summary of the data."""
-        df = self.load_csv(filename)
-        description = df.describe(include='all').to_dict()
-        # Convert timestamps to strings for JSON serialization
-        return description
+        """Returns count, mean, std, min/max, approximate quartiles and distinct counts per column.
+
+        Read from the cached column summaries, so the data isn't rescanned.
+        """
+        return describe_summaries(self.column_summaries(filename))
 
     def get_all_data_files(self) -> list[str]:
         """Returns a list of all CSV files in the data directory."""
@@ -44,216 +604,162 @@ class DataLoader:
 
     def get_data_for_period(self, filename: str, days: int = 30) -> pd.DataFrame:
         """Loads data and filters it for the last N days based on 'create_time' or 'start_time'."""
-        df = self.load_csv(filename)
-        
-        # Identify time column
-        time_col = None
-        for col in ['create_time', 'start_time', 'time']:
-            if col in df.columns:
-                time_col = col
-                break
-        
-        if not time_col:
-            return df # Cannot filter if no time column found
-            
-        # Ensure it's datetime
-        df[time_col] = pd.to_datetime(df[time_col])
-        
-        # Filter for last N days
+        # Filter for last N days (files without a time column come back unfiltered)
         cutoff = pd.Timestamp.now() - pd.Timedelta(days=days)
-        return df[df[time_col] >= cutoff]
+        return self.fetch_range(filename, start=cutoff)
+
+    @timed("aggregate.heart_rate")
+    def aggregate_heart_rate_data(self, days: int = 30, reference: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+        """Aggregates heart rate and HRV data for advanced analysis.
 
-    def aggregate_heart_rate_data(self, days: int = 30) -> Dict[str, Any]:
-        """Aggregates heart rate and HRV data for advanced analysis."""
+        The period is the `days` before `reference` (default: now).
+        """
         summary = {}
         try:
-            def safe_fetch_range(filename, start_days, end_days):
-                try:
-                    df = self.load_csv(filename)
-                    time_col = next((c for c in ['create_time', 'start_time', 'time'] if c in df.columns), None)
-                    if not time_col: return df
-                    df[time_col] = pd.to_datetime(df[time_col])
-                    now = pd.Timestamp.now()
-                    cutoff_start = now - pd.Timedelta(days=start_days)
-                    cutoff_end = now - pd.Timedelta(days=end_days)
-                    return df[(df[time_col] >= cutoff_start) & (df[time_col] < cutoff_end)]
-                except:
-                    return pd.DataFrame()
-
-            import numpy as np
-            def add_polynomial_trend(data_list, value_key, degree=5):
-                if not data_list or len(data_list) < degree + 1: return data_list
-                try:
-                    y = np.array([d[value_key] for d in data_list])
-                    x = np.arange(len(y))
-                    coeffs = np.polyfit(x, y, degree)
-                    p = np.poly1d(coeffs)
-                    trend_vals = p(x)
-                    for i, d in enumerate(data_list):
-                        d['trend_line'] = trend_vals[i]
-                except:
-                    pass
-                return data_list
-
-            hr_df = safe_fetch_range("heart_rate.csv", days, 0)
-            prev_hr_df = safe_fetch_range("heart_rate.csv", days * 2, days)
-            
-            vitality_df = safe_fetch_range("vitality_score.csv", days, 0)
-            prev_vitality_df = safe_fetch_range("vitality_score.csv", days * 2, days)
-
-            sleep_df = safe_fetch_range("sleep.csv", days, 0)
-
-            def calc_trend(curr_val, prev_val):
-                if not curr_val or not prev_val or prev_val == 0: return 0
-                return ((curr_val - prev_val) / prev_val) * 100
+            # Period statistics and the sleep-session join come from the shared,
+            # memoized metric engine, so the sleep report reuses them
+            if reference is None:
+                reference = self.metrics.reference_time()
+            start, end = self.metrics.window(days, 0, reference)
+            hr_stats, prev_hr_stats = self.metrics.period_stats("heart_rate.csv", 'heart_rate', days, reference)
+            hrv_stats, prev_hrv_stats = self.metrics.period_stats("vitality_score.csv", 'shrv_value', days, reference)
+            trends = self.metrics.daily_trends(start, end)
 
             hr_metrics = []
-            if not hr_df.empty:
-                # Samples for the chart (grouped by day)
-                df_grouped = hr_df.copy()
-                time_col = next((c for c in ['create_time', 'start_time', 'time'] if c in df_grouped.columns), None)
-                df_grouped['day'] = df_grouped[time_col].dt.strftime('%Y-%m-%d')
-                hr_metrics = df_grouped.groupby('day')['heart_rate'].mean().reset_index().to_dict(orient='records')
-                hr_metrics = add_polynomial_trend(hr_metrics, 'heart_rate')
+            if hr_stats['count']:
+                # Daily means for the chart, read from the daily rollup
+                daily = self.metrics.daily_series("heart_rate.csv", 'heart_rate', start, end)
+                hr_metrics = trend_records({"day": daily.index.strftime('%Y-%m-%d'), "heart_rate": daily['mean'].to_numpy()}, trends, 'heart_rate')
 
             # Sleeping HR Calculation
             sleeping_hr_metrics = []
             sleeping_hr_avg = None
-            if not sleep_df.empty and not hr_df.empty:
-                session_averages = []
-                # Ensure datetime for comparison
-                hr_temp = hr_df.copy()
-                hr_time_col = next((c for c in ['create_time', 'start_time', 'time'] if c in hr_temp.columns), None)
-                hr_temp[hr_time_col] = pd.to_datetime(hr_temp[hr_time_col])
-                
-                for _, session in sleep_df.iterrows():
-                    start = pd.to_datetime(session['start_time'])
-                    end = pd.to_datetime(session['end_time'])
-                    # Filter HR for this session
-                    session_hr = hr_temp[(hr_temp[hr_time_col] >= start) & (hr_temp[hr_time_col] <= end)]
-                    if not session_hr.empty:
-                        avg_hr = session_hr['heart_rate'].mean()
-                        session_averages.append({
-                            "day": start.strftime('%Y-%m-%d'),
-                            "sleeping_heart_rate": round(avg_hr, 1)
-                        })
-                sleeping_hr_metrics = session_averages
-                if session_averages:
-                    sleeping_hr_avg = sum(s['sleeping_heart_rate'] for s in session_averages) / len(session_averages)
-                    sleeping_hr_metrics = add_polynomial_trend(sleeping_hr_metrics, 'sleeping_heart_rate')
+            sleeping_hr_min = None
+            session_stats = self.metrics.session_stats("sleep.csv", "heart_rate.csv", 'heart_rate', start, end)
+            if not session_stats.empty and session_stats['count'].any():
+                session_stats = session_stats[session_stats['count'] > 0]
+                sleep_df = self.metrics.rows("sleep.csv", start, end)
+                days_of_sessions = pd.to_datetime(sleep_df.loc[session_stats.index, 'start_time']).dt.strftime('%Y-%m-%d')
+                sleeping_hr = session_stats['mean'].round(1)
+                sleeping_hr_metrics = trend_records({"day": days_of_sessions, "sleeping_heart_rate": sleeping_hr}, trends, 'sleeping_heart_rate')
+                sleeping_hr_avg = sleeping_hr.mean()
+                sleeping_hr_min = session_stats['min'].min()
 
             summary = {
                 "hr_metrics": hr_metrics,
                 "sleeping_hr_metrics": sleeping_hr_metrics,
+                "trends": summarize_trends(trends, ["heart_rate", "sleeping_heart_rate", "hrv"]),
                 "metrics": {
                     "hr_avg": {
-                        "value": hr_df['heart_rate'].mean() if not hr_df.empty else None,
-                        "trend": calc_trend(hr_df['heart_rate'].mean(), prev_hr_df['heart_rate'].mean()) if not hr_df.empty and not prev_hr_df.empty else 0
+                        "value": hr_stats['mean'],
+                        "trend": calc_trend(hr_stats['mean'], prev_hr_stats['mean'])
                     },
                     "hr_sleeping": {
                         "value": sleeping_hr_avg,
+                        "min": sleeping_hr_min,
                         "trend": 0 # Trend calculation for sleeping HR would require previous period sleep data
                     },
                     "hr_min": {
-                        "value": hr_df['heart_rate'].min() if not hr_df.empty else None,
-                        "trend": calc_trend(hr_df['heart_rate'].min(), prev_hr_df['heart_rate'].min()) if not hr_df.empty and not prev_hr_df.empty else 0
+                        "value": hr_stats['min'],
+                        "trend": calc_trend(hr_stats['min'], prev_hr_stats['min'])
                     },
                     "hr_max": {
-                        "value": hr_df['heart_rate'].max() if not hr_df.empty else None,
-                        "trend": calc_trend(hr_df['heart_rate'].max(), prev_hr_df['heart_rate'].max()) if not hr_df.empty and not prev_hr_df.empty else 0
+                        "value": hr_stats['max'],
+                        "trend": calc_trend(hr_stats['max'], prev_hr_stats['max'])
                     },
                     "hrv": {
-                        "value": vitality_df['shrv_value'].mean() if not vitality_df.empty else None,
-                        "trend": calc_trend(vitality_df['shrv_value'].mean(), prev_vitality_df['shrv_value'].mean()) if not vitality_df.empty and not prev_vitality_df.empty else 0
+                        "value": hrv_stats['mean'],
+                        "trend": calc_trend(hrv_stats['mean'], prev_hrv_stats['mean'])
                     }
                 }
             }
             return summary
         except Exception as e:
+            count_error("aggregate_heart_rate")
             print(f"Heart rate aggregation error: {e}")
             return summary
 
-    def aggregate_sleep_data(self, days: int = 30) -> Dict[str, Any]:
-        """Aggregates multiple data sources for advanced sleep analysis."""
+    @timed("aggregate.sleep")
+    def aggregate_sleep_data(self, days: int = 30, reference: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+        """Aggregates multiple data sources for advanced sleep analysis.
+
+        The period is the `days` before `reference` (default: now).
+        """
         summary = {}
         try:
-            # Helper to load data for range
-            def safe_fetch_range(filename, start_days, end_days):
-                try:
-                    df = self.load_csv(filename)
-                    time_col = next((c for c in ['create_time', 'start_time', 'time'] if c in df.columns), None)
-                    if not time_col: return df
-                    df[time_col] = pd.to_datetime(df[time_col])
-                    now = pd.Timestamp.now()
-                    cutoff_start = now - pd.Timedelta(days=start_days)
-                    cutoff_end = now - pd.Timedelta(days=end_days)
-                    return df[(df[time_col] >= cutoff_start) & (df[time_col] < cutoff_end)]
-                except:
-                    return pd.DataFrame()
-
-            # Fetch current and previous periods
-            sleep_df = safe_fetch_range("sleep.csv", days, 0)
-            prev_sleep_df = safe_fetch_range("sleep.csv", days * 2, days)
-            
-            hr_df = safe_fetch_range("heart_rate.csv", days, 0)
-            prev_hr_df = safe_fetch_range("heart_rate.csv", days * 2, days)
-            
-            spo2_df = safe_fetch_range("oxygen_saturation.csv", days, 0)
-            prev_spo2_df = safe_fetch_range("oxygen_saturation.csv", days * 2, days)
-            
-            vitality_df = safe_fetch_range("vitality_score.csv", days, 0)
-            prev_vitality_df = safe_fetch_range("vitality_score.csv", days * 2, days)
-
-            stages_df = safe_fetch_range("sleep_stage.csv", days, 0)
+            # Current and previous period statistics, merged from the rollups
+            if reference is None:
+                reference = self.metrics.reference_time()
+            start, end = self.metrics.window(days, 0, reference)
+
+            def period_stats(filename, column):
+                return self.metrics.period_stats(filename, column, days, reference)
+
+            duration_stats, prev_duration_stats = period_stats("sleep.csv", 'sleep_duration')
+            efficiency_stats, prev_efficiency_stats = period_stats("sleep.csv", 'efficiency')
+            hr_stats, prev_hr_stats = period_stats("heart_rate.csv", 'heart_rate')
+            spo2_stats, prev_spo2_stats = period_stats("oxygen_saturation.csv", 'spo2')
+            hrv_stats, prev_hrv_stats = period_stats("vitality_score.csv", 'shrv_value')
+
+            # Raw rows of the current period for the per-night views
+            sleep_df = self.metrics.rows("sleep.csv", start, end)
+            stages_df = self.metrics.rows("sleep_stage.csv", start, end)
+            trends = self.metrics.daily_trends(start, end)
 
             # Create a summary for AI
             sleep_metrics = []
             if not sleep_df.empty:
                 df_copy = sleep_df[['start_time', 'sleep_score', 'efficiency', 'sleep_duration', 'physical_recovery', 'mental_recovery']].tail(days).copy()
                 df_copy['start_time'] = pd.to_datetime(df_copy['start_time']).dt.strftime('%Y-%m-%d')
-                sleep_metrics = df_copy.to_dict(orient='records')
+                sleep_metrics = trend_records(df_copy, trends, 'sleep_score', day_key='start_time')
 
             # Aggregate sleep stages
             stages_summary = {}
             if not stages_df.empty and 'start_time' in stages_df.columns and 'end_time' in stages_df.columns:
                 try:
-                    stages_df['duration_min'] = (pd.to_datetime(stages_df['end_time']) - pd.to_datetime(stages_df['start_time'])).dt.total_seconds() / 60
-                    stages_summary = stages_df.groupby('stage')['duration_min'].sum().round(1).to_dict()
+                    stages_df = stages_df.assign(duration_min=(pd.to_datetime(stages_df['end_time']) - pd.to_datetime(stages_df['start_time'])).dt.total_seconds() / 60)
+                    stages_summary = stages_df.groupby('stage', observed=True)['duration_min'].sum().round(1).to_dict()
                 except: pass
 
-            def calc_trend(curr_val, prev_val):
-                if not curr_val or not prev_val or prev_val == 0: return 0
-                return ((curr_val - prev_val) / prev_val) * 100
+            # Vitals restricted to the sleep sessions themselves
+            sleeping_hr = self.metrics.sleeping_mean("sleep.csv", "heart_rate.csv", 'heart_rate', start, end)
+            sleeping_spo2 = self.metrics.sleeping_mean("sleep.csv", "oxygen_saturation.csv", 'spo2', start, end)
+            sleeping_hrv = self.metrics.sleeping_mean("sleep.csv", "vitality_score.csv", 'shrv_value', start, end)
 
             summary = {
                 "sleep_metrics": sleep_metrics,
                 "stages_summary": stages_summary,
+                "trends": summarize_trends(trends, ["sleep_score", "sleeping_heart_rate", "spo2", "hrv"]),
                 "metrics": {
                     "sleep_duration": {
-                        "value": sleep_df['sleep_duration'].mean() if not sleep_df.empty else None,
-                        "trend": calc_trend(sleep_df['sleep_duration'].mean(), prev_sleep_df['sleep_duration'].mean()) if not sleep_df.empty and not prev_sleep_df.empty else 0
+                        "value": duration_stats['mean'],
+                        "trend": calc_trend(duration_stats['mean'], prev_duration_stats['mean'])
                     },
                     "efficiency": {
-                        "value": sleep_df['efficiency'].mean() if not sleep_df.empty else None,
-                        "trend": calc_trend(sleep_df['efficiency'].mean(), prev_sleep_df['efficiency'].mean()) if not sleep_df.empty and not prev_sleep_df.empty else 0
+                        "value": efficiency_stats['mean'],
+                        "trend": calc_trend(efficiency_stats['mean'], prev_efficiency_stats['mean'])
                     },
                     "hr": {
-                        "value": hr_df['heart_rate'].mean() if not hr_df.empty else None,
-                        "min": hr_df['heart_rate'].min() if not hr_df.empty else None,
-                        "trend": calc_trend(hr_df['heart_rate'].mean(), prev_hr_df['heart_rate'].mean()) if not hr_df.empty and not prev_hr_df.empty else 0
+                        "value": hr_stats['mean'],
+                        "min": hr_stats['min'],
+                        "sleeping": sleeping_hr,
+                        "trend": calc_trend(hr_stats['mean'], prev_hr_stats['mean'])
                     },
                     "spo2": {
-                        "value": spo2_df['spo2'].mean() if not spo2_df.empty else None,
-                        "min": spo2_df['spo2'].min() if not spo2_df.empty else None,
-                        "trend": calc_trend(spo2_df['spo2'].mean(), prev_spo2_df['spo2'].mean()) if not spo2_df.empty and not prev_spo2_df.empty else 0
+                        "value": spo2_stats['mean'],
+                        "min": spo2_stats['min'],
+                        "sleeping": sleeping_spo2,
+                        "trend": calc_trend(spo2_stats['mean'], prev_spo2_stats['mean'])
                     },
                     "hrv": {
-                        "value": vitality_df['shrv_value'].mean() if not vitality_df.empty else None,
-                        "trend": calc_trend(vitality_df['shrv_value'].mean(), prev_vitality_df['shrv_value'].mean()) if not vitality_df.empty and not prev_vitality_df.empty else 0
+                        "value": hrv_stats['mean'],
+                        "sleeping": sleeping_hrv,
+                        "trend": calc_trend(hrv_stats['mean'], prev_hrv_stats['mean'])
                     }
                 }
             }
             return summary
         except Exception as e:
+            count_error("aggregate_sleep")
             print(f"Aggregation error: {e}")
             return summary
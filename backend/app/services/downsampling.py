@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+from .telemetry import timed
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `max_points` visually representative points.
+
+    The first and last points are always kept. Every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the mean of the next bucket, which preserves peaks and
+    troughs far better than taking every n-th sample.
+    """
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])[:max(max_points, 0)]
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Min/max envelope: the minimum and maximum of each of max_points/2 equal buckets.
+
+    Keeps every extreme value, which makes it the right choice for spotting
+    spikes; the first and last points are always included. With room for
+    only one more point, that is the single value furthest from the mean.
+    """
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])[:max(max_points, 0)]
+    n_buckets = (max_points - 2) // 2
+    if n_buckets == 0:
+        return np.unique([0, n - 1, int(np.argmax(np.abs(y - y.mean())))])
+    bucket = np.minimum((np.arange(n) * n_buckets) // n, n_buckets - 1)
+    # Sorting by (bucket, y) puts each bucket's minimum first and maximum last
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets), side='left')
+    ends = np.searchsorted(bucket[order], np.arange(n_buckets), side='right') - 1
+    picked = np.concatenate(([0, n - 1], order[starts], order[ends]))
+    return np.unique(picked)
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray:
+    """Sorted row positions to keep. NaN values of `y` are never selected."""
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= max_points:
+        return valid
+    if method == "minmax":
+        keep = minmax_indices(y[valid], max_points)
+    else:
+        keep = lttb_indices(x[valid], y[valid], max_points)
+    return valid[keep]
+
+@timed("downsample")
+def downsample_frame(df: pd.DataFrame, max_points: int, value_col: Optional[str] = None, time_col: Optional[str] = None, method: str = "lttb") -> pd.DataFrame:
+    """Reduces a frame to at most `max_points` rows, chosen on `value_col`.
+
+    `value_col` defaults to the first numeric column; rows are spaced by
+    `time_col` when it holds timestamps, otherwise by position.
+    """
+    if len(df) <= max_points:
+        return df
+    if value_col is None:
+        numeric = df.select_dtypes(include='number').columns
+        if len(numeric) == 0:
+            return df.iloc[np.linspace(0, len(df) - 1, max_points).astype(int)]
+        value_col = numeric[0]
+    y = pd.to_numeric(df[value_col], errors='coerce').to_numpy(dtype=float)
+    if time_col is not None and pd.api.types.is_datetime64_any_dtype(df[time_col]):
+        x = df[time_col].to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    else:
+        x = np.arange(len(df), dtype=float)
+    return df.iloc[downsample_indices(x, y, max_points, method)]
+
+@timed("downsample")
+def downsample_records(records: List[Dict[str, Any]], value_key: str, max_points: int, method: str = "lttb") -> List[Dict[str, Any]]:
+    """downsample_frame() for a chart series given as a list of per-point dicts."""
+    if len(records) <= max_points:
+        return records
+    y = np.array([r.get(value_key) for r in records], dtype=float)
+    keep = downsample_indices(np.arange(len(records), dtype=float), y, max_points, method)
+    return [records[i] for i in keep]
@@ -0,0 +1,23 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# pandas aggregation is CPU bound and mostly holds the GIL, so a few workers are
+# enough to keep the event loop free without oversubscribing the machine.
+DATA_WORKERS = int(os.environ.get("DATA_WORKERS", min(4, os.cpu_count() or 1)))
+
+_pool = ThreadPoolExecutor(max_workers=DATA_WORKERS, thread_name_prefix="data-worker")
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a synchronous call on the bounded data pool and awaits its result.
+
+    The caller's context variables are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_pool, partial(ctx.run, func, *args, **kwargs))
@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+DATA_CACHE_MAX_BYTES = int(os.environ.get("DATA_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+class FrameCache(Generic[V]):
+    """Thread-safe, byte-budgeted LRU cache for parsed data files.
+
+    Every entry is weighed with `sizeof` when it is stored (and again on
+    `resize`, for entries that grow derived tables after insertion). Once the
+    total exceeds `max_bytes`, the least recently used entries are evicted;
+    the most recently stored entry is always kept, even if it alone is over
+    the budget.
+    """
+
+    def __init__(self, sizeof: Callable[[V], int], max_bytes: int = DATA_CACHE_MAX_BYTES):
+        self.sizeof = sizeof
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            self._total_bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._evict()
+
+    def resize(self, key: Hashable) -> None:
+        """Re-weighs an entry after it grew (e.g. rollups were added to it)."""
+        with self._lock:
+            value = self._entries.get(key)
+        if value is None:
+            return
+        size = self.sizeof(value)
+        with self._lock:
+            if self._entries.get(key) is value:
+                self._total_bytes += size - self._sizes[key]
+                self._sizes[key] = size
+                self._evict()
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._total_bytes -= self._sizes.pop(key)
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "files": {str(key): size for key, size in self._sizes.items()},
+            }
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(key)
+            self.evictions += 1
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+INSIGHT_CACHE_MAX_BYTES = int(os.environ.get("INSIGHT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+class InsightCache:
+    """Persistent, size-bounded LRU cache of finished LLM generations.
+
+    Entries are keyed by a hash of (model, system instruction, prompt), so the
+    same data window analysed by the same model is only generated once. Storage
+    is a single SQLite file; when the total size of the cached texts exceeds
+    `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int = INSIGHT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Insight cache at {path} unavailable, keeping it in memory: {e}")
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS insights (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    thinking TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS insights_last_used ON insights (last_used)")
+            self._conn.commit()
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM insights").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str) -> str:
+        """Content address of a generation request."""
+        material = json.dumps([model, system, prompt], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns {'model', 'thinking', 'response'} for a cached generation, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model, thinking, response FROM insights WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE insights SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return {"model": row[0], "thinking": row[1], "response": row[2]}
+
+    def put(self, key: str, model: str, thinking: str, response: str) -> None:
+        """Stores a finished generation and evicts LRU entries beyond the size budget."""
+        size = len(thinking.encode("utf-8")) + len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM insights WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO insights (key, model, thinking, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, thinking, response, size, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            while self._total_bytes > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM insights ORDER BY last_used ASC LIMIT 1"
+                ).fetchone()
+                if oldest is None:
+                    break
+                self._conn.execute("DELETE FROM insights WHERE key = ?", (oldest[0],))
+                self._total_bytes -= oldest[1]
+                self.evictions += 1
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .telemetry import count_error
+
+# Finished jobs kept for later retrieval; the oldest are dropped first
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 50))
+# Finished jobs are dropped after this long even when there is room
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+
+# (event name, JSON-serializable data) as produced by a job's run
+JobEvent = Tuple[str, Any]
+
+class Job:
+    """One background analysis and every event it has produced so far.
+
+    Events are numbered from 1 and kept until the job is evicted, so a
+    client that reconnects with the id of the last event it saw receives
+    exactly the events after it.
+    """
+
+    def __init__(self, kind: str, params: Dict[str, Any], key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.state = "queued"  # queued, running, done or error
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[JobEvent] = []
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "error")
+
+    async def publish(self, name: str, data: Any) -> None:
+        async with self._changed:
+            self.events.append((name, data))
+            self._changed.notify_all()
+
+    async def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        async with self._changed:
+            if error is None:
+                self.state = "done"
+                self.result = result
+                self.events.append(("done", result))
+            else:
+                self.state = "error"
+                self.error = error
+                self.events.append(("error", {"message": error}))
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[Tuple[int, str, Any]]:
+        """Yields (event id, name, data) for every event after id `after`, until the job finishes."""
+        index = max(0, after)
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.events) or self.finished)
+                batch = self.events[index:]
+                finished = self.finished
+            for event_id, (name, data) in enumerate(batch, start=index + 1):
+                yield event_id, name, data
+            index += len(batch)
+            if finished and index >= len(self.events):
+                return
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "state": self.state,
+            "events": len(self.events),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class JobStore:
+    """In-process registry of background jobs with bounded retention.
+
+    Jobs run as tasks of their own, so a generation goes on (and its
+    events are kept) when the client that started it disconnects.
+    Submitting a job with the `key` of one that is still unfinished returns
+    that job instead of starting a second one.
+    """
+
+    def __init__(self, retention: int = JOB_RETENTION, ttl: float = JOB_TTL_SECONDS):
+        self.retention = retention
+        self.ttl = ttl
+        self.submitted = 0
+        self.reused = 0
+        self.evicted = 0
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+
+    def submit(self, kind: str, params: Dict[str, Any], run: Callable[[Job], AsyncIterator[JobEvent]], key: Optional[str] = None) -> Job:
+        """Starts `run(job)` in the background; every event it yields is published on the job.
+
+        The last event must be ("result", {...}), which becomes the job's result.
+        """
+        if key is not None and key in self._active:
+            self.reused += 1
+            return self._active[key]
+        self._prune()
+        job = Job(kind, params, key)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active[key] = job
+        self.submitted += 1
+        job.task = asyncio.create_task(self._execute(job, run))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def close(self) -> None:
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        states = [job.state for job in self._jobs.values()]
+        return {
+            "jobs": len(states),
+            "running": states.count("running") + states.count("queued"),
+            "retention": self.retention,
+            "ttl_seconds": self.ttl,
+            "submitted": self.submitted,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
+
+    async def _execute(self, job: Job, run: Callable[[Job], AsyncIterator[JobEvent]]) -> None:
+        result = None
+        error = None
+        try:
+            job.state = "running"
+            async for name, data in run(job):
+                if name == "result":
+                    result = data
+                else:
+                    await job.publish(name, data)
+        except asyncio.CancelledError:
+            error = "Job was cancelled"
+            raise
+        except Exception as e:
+            count_error("job")
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            error = str(e)
+        finally:
+            if job.key is not None and self._active.get(job.key) is job:
+                del self._active[job.key]
+            await job.finish(result, error)
+
+    def _prune(self) -> None:
+        """Drops expired finished jobs, then the oldest finished ones beyond the retention limit."""
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished]
+        expired = {job.id for job in finished if now - job.finished_at > self.ttl}
+        excess = len(finished) - len(expired) - self.retention
+        for job in finished:
+            if excess <= 0:
+                break
+            if job.id not in expired:
+                expired.add(job.id)
+                excess -= 1
+        for job_id in expired:
+            del self._jobs[job_id]
+        self.evicted += len(expired)
+
+job_store = JobStore()
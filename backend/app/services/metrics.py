@@ -0,0 +1,284 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .telemetry import span, timed
+from .trends import fit_trends
+
+if TYPE_CHECKING:
+    from .data_loader import DataLoader
+
+# Windows are anchored to "now" rounded up to this resolution: reports cover
+# whole days up to the end of today, and every request of the same day (both
+# dashboard tabs, pre-generated insights) shares their keys until data changes.
+REFERENCE_RESOLUTION = 'D'
+
+METRIC_MEMO_MAX_ENTRIES = 1024
+
+EMPTY_STATS = {"count": 0, "mean": None, "min": None, "max": None, "std": None}
+
+# Named metrics of the query API: name -> (file, column). Any other numeric
+# column can be queried as "<file>:<column>".
+METRICS = {
+    "heart_rate": ("heart_rate.csv", "heart_rate"),
+    "hrv": ("vitality_score.csv", "shrv_value"),
+    "spo2": ("oxygen_saturation.csv", "spo2"),
+    "sleep_score": ("sleep.csv", "sleep_score"),
+    "sleep_duration": ("sleep.csv", "sleep_duration"),
+    "sleep_efficiency": ("sleep.csv", "efficiency"),
+    "physical_recovery": ("sleep.csv", "physical_recovery"),
+    "mental_recovery": ("sleep.csv", "mental_recovery"),
+}
+
+# Query granularities. Hours and days are read from the matching rollup;
+# weeks (starting Monday) and months are merged from daily buckets.
+GRANULARITIES = {
+    "hour": ("hour", None),
+    "day": ("day", None),
+    "week": ("day", "W"),
+    "month": ("day", "M"),
+}
+AGGREGATIONS = ("count", "sum", "mean", "min", "max", "std")
+
+# Daily series fitted together for the report trends; the sleeping heart
+# rate is added from the sleep-session join
+TREND_METRICS = ("heart_rate", "hrv", "spo2", "sleep_score")
+TREND_FILES = ("heart_rate.csv", "sleep.csv", "vitality_score.csv", "oxygen_saturation.csv")
+
+def calc_trend(curr_val, prev_val):
+    """Relative change from the previous to the current period, in percent (0 if unknown)."""
+    if not curr_val or not prev_val or prev_val == 0: return 0
+    return ((curr_val - prev_val) / prev_val) * 100
+
+class MetricEngine:
+    """Memoized (file, window) -> statistic lookups shared by all reports.
+
+    Every result is keyed on the files it was computed from together with
+    their current version (the loader's source signature), so a reloaded or
+    appended file never serves stale numbers; superseded results simply age
+    out of the LRU memo. Concurrent callers that miss on the same key share
+    one computation: the first computes, the others wait for its result.
+    """
+
+    def __init__(self, loader: "DataLoader", max_entries: int = METRIC_MEMO_MAX_ENTRIES):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._results: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # key -> result of the computation in progress
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def reference_time(self) -> pd.Timestamp:
+        return pd.Timestamp.now().ceil(REFERENCE_RESOLUTION)
+
+    def window(self, start_days: int, end_days: int, reference: Optional[pd.Timestamp] = None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """[start, end) between `start_days` and `end_days` before the reference time."""
+        reference = reference if reference is not None else self.reference_time()
+        return reference - pd.Timedelta(days=start_days), reference - pd.Timedelta(days=end_days)
+
+    def window_stats(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, Any]:
+        """count/mean/min/max/std of a column in the window; empty stats if unavailable."""
+        try:
+            return dict(self._memo((filename,), ('stats', column, start, end),
+                                   lambda: self.loader.window_stats(filename, column, start, end)))
+        except Exception:
+            return dict(EMPTY_STATS)
+
+    def period_stats(self, filename: str, column: str, days: int, reference: Optional[pd.Timestamp] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """window_stats() of the last `days` and of the `days` before them."""
+        reference = reference if reference is not None else self.reference_time()
+        return (self.window_stats(filename, column, *self.window(days, 0, reference)),
+                self.window_stats(filename, column, *self.window(days * 2, days, reference)))
+
+    def daily_series(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """DataLoader.daily_series(), memoized. The returned frame must not be modified."""
+        return self._memo((filename,), ('daily', column, start, end),
+                          lambda: self.loader.daily_series(filename, column, start, end))
+
+    def rows(self, filename: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """Raw rows of the window; empty if the file is missing or can't be windowed."""
+        try:
+            return self.loader.fetch_range(filename, start, end)
+        except Exception:
+            return pd.DataFrame()
+
+    def session_stats(self, sessions_file: str, samples_file: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """Per-session join_intervals() statistics of the sessions starting in the window.
+
+        Indexed like rows(sessions_file, start, end); empty if either file is
+        unavailable. The returned frame must not be modified.
+        """
+        def compute():
+            sessions = self.rows(sessions_file, start, end)
+            samples = self.rows(samples_file, start, end)
+            if sessions.empty or samples.empty:
+                return pd.DataFrame()
+            return self.loader.join_intervals(sessions, samples, column)
+
+        try:
+            return self._memo((sessions_file, samples_file), ('sessions', column, start, end), compute)
+        except Exception:
+            return pd.DataFrame()
+
+    def sleeping_mean(self, sessions_file: str, samples_file: str, column: str, start: pd.Timestamp, end: pd.Timestamp) -> Optional[float]:
+        """Mean over the sessions of the per-session mean of `column` (None if no overlap)."""
+        session_stats = self.session_stats(sessions_file, samples_file, column, start, end)
+        if session_stats.empty:
+            return None
+        session_means = session_stats.loc[session_stats['count'] > 0, 'mean']
+        return session_means.mean() if not session_means.empty else None
+
+    def daily_trends(self, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, Any]:
+        """fit_trends() of the daily report metrics in the window, all fitted in one pass.
+
+        Covers TREND_METRICS plus "sleeping_heart_rate" (mean per night,
+        keyed by the day the session started); metrics whose file is missing
+        are left out. Shared by both reports. The result must not be modified.
+        """
+        files = tuple(f for f in TREND_FILES if os.path.exists(os.path.join(self.loader.data_dir, f)))
+
+        def compute():
+            days = pd.date_range(start.floor('D'), (end - pd.Timedelta(1)).floor('D'), freq='D')
+            columns = {}
+            for metric in TREND_METRICS:
+                filename, column = METRICS[metric]
+                if filename in files:
+                    columns[metric] = self.daily_series(filename, column, start, end)['mean']
+            sessions = self.session_stats("sleep.csv", "heart_rate.csv", 'heart_rate', start, end)
+            if not sessions.empty:
+                sessions = sessions[sessions['count'] > 0]
+                nights = self.rows("sleep.csv", start, end).loc[sessions.index, 'start_time'].dt.floor('D')
+                columns["sleeping_heart_rate"] = sessions['mean'].groupby(nights.to_numpy()).mean()
+            frame = pd.DataFrame({name: series.reindex(days) for name, series in columns.items()}, index=days)
+            with span("trends"):
+                return fit_trends(frame)
+
+        return self._memo(files, ('trends', start, end), compute)
+
+    def resolve_metric(self, metric: str) -> Tuple[str, str]:
+        """(file, column) of a named metric or of a "<file>:<column>" reference."""
+        if metric in METRICS:
+            return METRICS[metric]
+        filename, sep, column = metric.partition(":")
+        if not sep or not filename or not column or os.path.basename(filename) != filename:
+            raise ValueError(f"Unknown metric '{metric}'")
+        return filename, column
+
+    def buckets(self, filename: str, column: str, start: pd.Timestamp, end: pd.Timestamp, granularity: str = 'day') -> pd.DataFrame:
+        """Rollup buckets (count/sum/min/max/sumsq) of `column` in [start, end) at the given granularity.
+
+        Buckets without samples are omitted. The returned frame must not be modified.
+        """
+        freq, period = GRANULARITIES[granularity]
+
+        def compute():
+            table = self.loader.rollup_range(filename, column, start, end, freq)
+            table = table[table['count'] > 0]
+            if period is None or table.empty:
+                return table
+            groups = table.index.to_period(period).start_time
+            return table.groupby(groups).agg({'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'sumsq': 'sum'}).rename_axis(table.index.name)
+
+        return self._memo((filename,), ('buckets', column, start, end, granularity), compute)
+
+    @timed("metrics.query")
+    def query(self, metrics: Sequence[str], start: pd.Timestamp, end: pd.Timestamp, granularity: str = 'day', aggs: Sequence[str] = ('mean', 'min', 'max')) -> Dict[str, Any]:
+        """Per-bucket and whole-window aggregations of several metrics over an explicit window.
+
+        Everything is merged from the rollups, so the cost does not depend on
+        how many raw samples the window covers.
+        """
+        result = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": granularity,
+            "metrics": {},
+        }
+        for metric in metrics:
+            filename, column = self.resolve_metric(metric)
+            if column not in self.loader.get_rollup(filename, 'day'):
+                raise ValueError(f"{filename} has no numeric column '{column}'")
+            table = self.buckets(filename, column, start, end, granularity)
+            values = _aggregate(table, aggs)
+            totals = _aggregate(pd.DataFrame([{
+                'count': table['count'].sum(),
+                'sum': table['sum'].sum(),
+                'min': table['min'].min(),
+                'max': table['max'].max(),
+                'sumsq': table['sumsq'].sum(),
+            }]), aggs)
+            result["metrics"][metric] = {
+                "file": filename,
+                "column": column,
+                "series": [
+                    {"time": bucket.isoformat(), **{agg: _json_value(agg, values[agg][i]) for agg in aggs}}
+                    for i, bucket in enumerate(table.index)
+                ],
+                "total": {agg: _json_value(agg, totals[agg][0]) for agg in aggs},
+            }
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._results), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def _memo(self, files: Sequence[str], key: Tuple, compute: Callable[[], Any]) -> Any:
+        versions = tuple(self.loader.file_version(f) for f in files)
+        full_key = (tuple(files), versions) + key
+        with self._lock:
+            if full_key in self._results:
+                self._results.move_to_end(full_key)
+                self.hits += 1
+                return self._results[full_key]
+            pending = self._pending.get(full_key)
+            if pending is None:
+                self.misses += 1
+                self._pending[full_key] = result = Future()
+            else:
+                self.coalesced += 1
+        if pending is not None:
+            return pending.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[full_key]
+            result.set_exception(e)
+            raise
+        with self._lock:
+            self._results[full_key] = value
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            del self._pending[full_key]
+        result.set_result(value)
+        return value
+
+def _aggregate(table: pd.DataFrame, aggs: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Requested AGGREGATIONS per row of a count/sum/min/max/sumsq table."""
+    count = table['count'].to_numpy(dtype=float)
+    total = table['sum'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = (table['sumsq'].to_numpy(dtype=float) - count * mean * mean) / (count - 1)
+    columns = {
+        "count": count,
+        "sum": total,
+        "mean": mean,
+        "min": table['min'].to_numpy(dtype=float),
+        "max": table['max'].to_numpy(dtype=float),
+        "std": np.where(count > 1, np.sqrt(np.clip(variance, 0, None)), np.nan),
+    }
+    return {agg: columns[agg] for agg in aggs}
+
+def _json_value(agg: str, value: float) -> Optional[float]:
+    if np.isnan(value):
+        return None
+    return int(value) if agg == "count" else float(value)
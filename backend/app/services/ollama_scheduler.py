@@ -0,0 +1,178 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .telemetry import OLLAMA_QUEUE_SECONDS
+
+# Number of generations Ollama runs at once. A single local GPU serves one
+# 14B generation fastest; parallel runs just slow each other down.
+OLLAMA_MAX_INFLIGHT = int(os.environ.get("OLLAMA_MAX_INFLIGHT", 1))
+
+Event = Tuple[str, Any]
+
+# Interactive generations always go first; background ones (pre-generated
+# reports) only start when no interactive one is waiting and are cancelled
+# when an interactive one needs their slot.
+PRIORITIES = ("interactive", "background")
+
+class GenerationPreempted(Exception):
+    """A background generation was cancelled to make room for an interactive one."""
+
+class Generation:
+    """One upstream generation, shared by every caller that asked for the same key.
+
+    Events produced by the upstream run are buffered, so a subscriber that
+    joins late still receives the full sequence from the first token.
+    """
+
+    def __init__(self, key: str, run: Callable[[], AsyncIterator[Event]], priority: str = "interactive"):
+        self.key = key
+        self.run = run
+        self.priority = priority
+        self.preempted = False
+        self.events: List[Event] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.submitted_at = time.monotonic()
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Event) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.error = error
+            self.finished = True
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        """Yields every event of the generation, then raises its error if it failed."""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.events) or self.finished)
+                batch = self.events[index:]
+                finished = self.finished
+            index += len(batch)
+            for event in batch:
+                yield event
+            if finished and index >= len(self.events):
+                if self.error is not None:
+                    raise self.error
+                return
+
+class GenerationScheduler:
+    """Runs at most `max_inflight` generations at a time, in FIFO order per priority.
+
+    Submitting a key that is already queued or running attaches the caller to
+    the existing generation instead of starting a second one. An interactive
+    caller attaching to a background generation promotes it.
+    """
+
+    def __init__(self, max_inflight: int = OLLAMA_MAX_INFLIGHT):
+        self.max_inflight = max(1, max_inflight)
+        self.coalesced = 0
+        self.completed = 0
+        self.preempted = 0
+        # monotonic time of the last interactive submission, for idle detection
+        self.last_interactive_at = 0.0
+        self._queue: Deque[Generation] = deque()
+        self._background: Deque[Generation] = deque()
+        self._running: Set[Generation] = set()
+        self._by_key: Dict[str, Generation] = {}
+
+    @property
+    def idle(self) -> bool:
+        return not self._running and not self._queue and not self._background
+
+    def submit(self, key: str, run: Callable[[], AsyncIterator[Event]], priority: str = "interactive") -> Generation:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        if priority == "interactive":
+            self.last_interactive_at = time.monotonic()
+        generation = self._by_key.get(key)
+        if generation is not None:
+            self.coalesced += 1
+            if priority == "interactive" and generation.priority == "background":
+                generation.priority = "interactive"
+                if generation in self._background:
+                    self._background.remove(generation)
+                    self._queue.append(generation)
+                    self._preempt()
+                    self._pump()
+        else:
+            generation = Generation(key, run, priority)
+            self._by_key[key] = generation
+            if priority == "interactive":
+                self._queue.append(generation)
+                self._preempt()
+            else:
+                self._background.append(generation)
+            self._pump()
+        generation.subscribers += 1
+        return generation
+
+    def queue_position(self, generation: Generation) -> int:
+        """0 while running (or done), otherwise the 1-based position in the queue."""
+        queue = list(self._queue) + list(self._background)
+        try:
+            return queue.index(generation) + 1
+        except ValueError:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_inflight": self.max_inflight,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "background_queued": len(self._background),
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "preempted": self.preempted,
+        }
+
+    def _preempt(self) -> None:
+        """Cancels running background generations until the waiting interactive ones fit.
+
+        Generations cancelled earlier hold their slot until they wind down,
+        but already count as making room and aren't cancelled again.
+        """
+        active = [g for g in self._running if not g.preempted]
+        waiting = len(self._queue) - (self.max_inflight - len(active))
+        for generation in [g for g in active if g.priority == "background"][:max(0, waiting)]:
+            generation.preempted = True
+            self.preempted += 1
+            generation.task.cancel()
+
+    def _pump(self) -> None:
+        while len(self._running) < self.max_inflight and (self._queue or self._background):
+            generation = self._queue.popleft() if self._queue else self._background.popleft()
+            self._running.add(generation)
+            generation.task = asyncio.create_task(self._execute(generation))
+
+    async def _execute(self, generation: Generation) -> None:
+        OLLAMA_QUEUE_SECONDS.observe(time.monotonic() - generation.submitted_at)
+        error = None
+        try:
+            async for event in generation.run():
+                await generation.publish(event)
+        except asyncio.CancelledError:
+            if not generation.preempted:
+                raise
+            error = GenerationPreempted(f"Generation {generation.key[:12]} was preempted by an interactive request")
+        except Exception as e:
+            error = e
+        finally:
+            # Unregister before waking subscribers so a new request for the same
+            # key starts fresh (or hits the insight cache) instead of attaching here
+            self._running.discard(generation)
+            self._by_key.pop(generation.key, None)
+            self.completed += 1
+            self._pump()
+            await generation.finish(error)
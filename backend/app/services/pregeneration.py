@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .ai_service import ai_service
+from .data_loader import DataLoader
+from .executor import run_blocking
+from .telemetry import count_error, span
+from .warmup import PERIOD_DAYS, REPORT_FILES, warmup
+
+# Reports users open after a new export, pre-generated in this order
+PREGENERATE_REPORTS = [("sleep", "week"), ("heart_rate", "week"), ("sleep", "month"), ("heart_rate", "month")]
+
+# Set PREGENERATE=0 to only generate insights when they are requested
+PREGENERATE_ENABLED = os.environ.get("PREGENERATE", "1") != "0"
+# How often the report files are checked for changes
+PREGENERATE_INTERVAL_SECONDS = float(os.environ.get("PREGENERATE_INTERVAL_SECONDS", 30))
+# Ollama counts as idle once nothing is queued or running and no interactive
+# request came in for this long
+PREGENERATE_IDLE_SECONDS = float(os.environ.get("PREGENERATE_IDLE_SECONDS", 10))
+
+# report -> (DataLoader aggregation, AIService analysis)
+REPORT_METHODS = {
+    "sleep": ("aggregate_sleep_data", "analyze_sleep_advanced"),
+    "heart_rate": ("aggregate_heart_rate_data", "analyze_heart_rate_advanced"),
+}
+
+class Pregenerator:
+    """Pre-generates the standard report insights while Ollama is idle.
+
+    The report files are checked every PREGENERATE_INTERVAL_SECONDS. When
+    one changed (or a new day moved the report windows), every report is
+    aggregated again at once, which fills the metric memo, and its insight
+    is generated at background priority. Interactive requests preempt a
+    background generation; it is retried on a later check. Finished
+    insights land in the insight cache, so opening a report is a cache hit.
+    """
+
+    def __init__(self, reports: Iterable[Tuple[str, str]] = PREGENERATE_REPORTS):
+        self.reports = list(reports)
+        self.state = "idle"
+        self.report_states: Dict[str, str] = {self._name(*report): "pending" for report in self.reports}
+        self.generated = 0
+        self.last_change_at: Optional[float] = None
+        self._version: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, loader: DataLoader) -> None:
+        if not PREGENERATE_ENABLED:
+            self.state = "disabled"
+            return
+        self._task = asyncio.create_task(self._run(loader))
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "reports": dict(self.report_states),
+            "generated": self.generated,
+            "last_change_at": self.last_change_at,
+        }
+
+    async def _run(self, loader: DataLoader) -> None:
+        while True:
+            try:
+                await self._check(loader)
+            except Exception as e:
+                print(f"Report pre-generation failed: {e}")
+                count_error("pregeneration")
+                self.state = "error"
+            await asyncio.sleep(PREGENERATE_INTERVAL_SECONDS)
+
+    async def _check(self, loader: DataLoader) -> None:
+        if not warmup.ready:
+            return
+        version = self._data_version(loader)
+        if version != self._version:
+            self._version = version
+            self.last_change_at = time.time()
+            self.report_states = {name: "pending" for name in self.report_states}
+
+        pending = [report for report in self.reports if self.report_states[self._name(*report)] not in ("ready", "no data")]
+        if not pending:
+            self.state = "ready"
+            return
+
+        reference = version[1]
+        self.state = "aggregating"
+        reports = {}
+        for report, period in pending:
+            aggregate = getattr(loader, REPORT_METHODS[report][0])
+            with span("pregeneration.aggregate"):
+                data = await run_blocking(aggregate, PERIOD_DAYS[period], reference)
+            if not data or not data.get('metrics'):
+                self.report_states[self._name(report, period)] = "no data"
+                continue
+            reports[(report, period)] = data
+
+        for (report, period), data in reports.items():
+            self.state = "waiting"
+            await self._wait_until_idle()
+            if self._data_version(loader) != version:
+                # Changed while waiting: start over on the next check
+                return
+            status = await ai_service.check_ollama_status()
+            if status.get("status") != "connected" or not status.get("model_exists"):
+                self.state = "ollama unavailable"
+                return
+
+            name = self._name(report, period)
+            self.state = "generating"
+            self.report_states[name] = "generating"
+            analyze = getattr(ai_service, REPORT_METHODS[report][1])
+            result = await analyze(data, period, priority="background")
+            if result["cache"] == "hit" or result["timings"] is not None:
+                self.report_states[name] = "ready"
+                self.generated += result["cache"] == "miss"
+            else:
+                # Preempted by a user's request (or failed): retried on the next check
+                self.report_states[name] = "pending"
+                self.state = "waiting"
+                return
+        self.state = "ready"
+
+    async def _wait_until_idle(self) -> None:
+        scheduler = ai_service.scheduler
+        while not scheduler.idle or time.monotonic() - scheduler.last_interactive_at < PREGENERATE_IDLE_SECONDS:
+            await asyncio.sleep(1)
+
+    def _data_version(self, loader: DataLoader) -> Tuple:
+        """Source signatures of the report files and the current report reference time."""
+        files = sorted({f for report, _ in self.reports for f in REPORT_FILES[report]})
+        signatures = []
+        for filename in files:
+            try:
+                stat = os.stat(os.path.join(loader.data_dir, filename))
+                signatures.append((filename, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signatures.append((filename, None))
+        return tuple(signatures), loader.metrics.reference_time()
+
+    @staticmethod
+    def _name(report: str, period: str) -> str:
+        return f"{report}:{period}"
+
+pregenerator = Pregenerator()
@@ -0,0 +1,106 @@
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .summary import SUMMARY_STATS
+
+# Rough size of a token for the estimates below (English text and numbers)
+CHARS_PER_TOKEN = 4
+# Token budget for the data of one prompt; longer series are averaged into
+# buckets of several days until they fit
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "700"))
+# At most this many rows per series: a month of single days
+MAX_SERIES_ROWS = 31
+# Keys of the chart records that hold the day of a row
+DAY_KEYS = ("day", "start_time")
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def format_number(value: Any, digits: int = 1, signed: bool = False) -> str:
+    """Rounded number without a trailing '.0'; missing values become ''."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    text = f"{round(float(value), digits):{'+' if signed else ''}.{digits}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "+0") else text
+
+def round_values(value: Any, digits: int = 1) -> Any:
+    """Copy of a JSON-like structure with every float rounded."""
+    if isinstance(value, dict):
+        return {key: round_values(v, digits) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [round_values(v, digits) for v in value]
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else round(float(value), digits) + 0.0
+    return value
+
+def compact_json(value: Any, digits: int = 1) -> str:
+    return json.dumps(round_values(value, digits), separators=(",", ":"))
+
+def compact_prompt(text: str) -> str:
+    """Strips the source-code indentation from every line of a prompt."""
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+def _series_frame(records: List[Dict[str, Any]], columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    frame = pd.DataFrame(records)
+    day_key = next((key for key in DAY_KEYS if key in frame), None)
+    if day_key is None:
+        raise ValueError("Records have no day column")
+    frame.index = pd.to_datetime(frame.pop(day_key))
+    if columns is not None:
+        frame = frame[[col for col in columns if col in frame]]
+    return frame.apply(pd.to_numeric, errors='coerce').dropna(axis=1, how='all')
+
+def _render_series(frame: pd.DataFrame, bucket: int, digits: int) -> str:
+    """Summary lines of the whole frame followed by one row of deltas per bucket."""
+    mean = frame.mean()
+    rows = frame.groupby(np.arange(len(frame)) // bucket).agg('mean')
+    labels = frame.index[::bucket].strftime('%m-%d')
+    first, last = frame.index[0].strftime('%Y-%m-%d'), frame.index[-1].strftime('%Y-%m-%d')
+    per_row = "day" if bucket == 1 else f"{bucket}-day average"
+    lines = [
+        f"{first} to {last}, {len(frame)} days. Rows: {per_row} minus the period mean.",
+        "|".join(["", *frame.columns]),
+    ]
+    for name, values in (("mean", mean), ("min", frame.min()), ("max", frame.max())):
+        lines.append("|".join([name, *(format_number(v, digits) for v in values)]))
+    for label, (_, values) in zip(labels, rows.iterrows()):
+        lines.append("|".join([label, *(format_number(v, digits, signed=True) for v in values - mean)]))
+    return "\n".join(lines)
+
+def compact_series(records: List[Dict[str, Any]], columns: Optional[Sequence[str]] = None, budget: int = PROMPT_TOKEN_BUDGET, max_rows: int = MAX_SERIES_ROWS, digits: int = 1) -> str:
+    """Encodes daily chart records as a small table that fits `budget` tokens.
+
+    The table starts with the mean, min and max of each column over all
+    records and then lists every day as its difference from the mean.
+    Series longer than `max_rows` (or too long for the budget) are averaged
+    into buckets of consecutive days, so the whole period stays covered.
+    """
+    if not records:
+        return "No data."
+    frame = _series_frame(records, columns)
+    if frame.empty:
+        return "No data."
+    bucket = max(1, math.ceil(len(frame) / max_rows))
+    while True:
+        text = _render_series(frame, bucket, digits)
+        if estimate_tokens(text) <= budget or bucket >= len(frame):
+            return text
+        bucket = min(bucket * 2, len(frame))
+
+def compact_summary(summary: Dict[str, Dict[str, Any]], digits: int = 2) -> str:
+    """Table of DataLoader.get_summary() statistics: one row per statistic, one column per data column."""
+    lines = ["|".join(["", *summary])]
+    for stat in SUMMARY_STATS:
+        values = [column.get(stat) for column in summary.values()]
+        if all(v is None for v in values):
+            continue
+        cells = [v if isinstance(v, str) else format_number(v, digits) for v in values]
+        lines.append("|".join([stat, *cells]))
+    return "\n".join(lines)
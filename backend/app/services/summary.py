@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+# Quantile estimates are within 1% of the true value
+SKETCH_RELATIVE_ACCURACY = 0.01
+# 2^12 HyperLogLog registers: about 1.6% standard error on distinct counts
+HLL_PRECISION = 12
+SUMMARY_QUANTILES = {"25%": 0.25, "50%": 0.5, "75%": 0.75}
+# Columns with at most this many distinct values keep exact value counts:
+# top/freq for text, exact quantiles for numeric columns
+MAX_TRACKED_VALUES = 1000
+# Order of the statistics in a description, as in DataFrame.describe()
+SUMMARY_STATS = ["count", "missing", "unique", "top", "freq", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a relative error guarantee (DDSketch).
+
+    Values are counted in logarithmically sized buckets, so every quantile
+    estimate is within `relative_accuracy` of a true value of the column.
+    Sketches of two parts of a column merge by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        # bucket index -> count, for the magnitudes of positive and negative values
+        self.positive = pd.Series(dtype='int64')
+        self.negative = pd.Series(dtype='int64')
+        self.zeros = 0
+
+    @property
+    def count(self) -> int:
+        return int(self.positive.sum() + self.negative.sum() + self.zeros)
+
+    def add(self, values: np.ndarray) -> "QuantileSketch":
+        values = values[~np.isnan(values)]
+        self.positive = self.positive.add(self._buckets(values[values > 0]), fill_value=0).astype('int64')
+        self.negative = self.negative.add(self._buckets(-values[values < 0]), fill_value=0).astype('int64')
+        self.zeros += int((values == 0).sum())
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        merged = QuantileSketch(self.relative_accuracy)
+        merged.positive = self.positive.add(other.positive, fill_value=0).astype('int64')
+        merged.negative = self.negative.add(other.negative, fill_value=0).astype('int64')
+        merged.zeros = self.zeros + other.zeros
+        return merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        count = self.count
+        if not count:
+            return None
+        # Buckets in value order: large negatives first, then zeros, then positives
+        negative = self.negative.sort_index(ascending=False)
+        positive = self.positive.sort_index()
+        values = np.concatenate([-self._value(negative.index.to_numpy()), [0.0], self._value(positive.index.to_numpy())])
+        counts = np.concatenate([negative.to_numpy(), [self.zeros], positive.to_numpy()])
+        position = int(np.searchsorted(np.cumsum(counts), q * (count - 1), side='right'))
+        return float(values[min(position, len(values) - 1)])
+
+    def nbytes(self) -> int:
+        return 16 * (len(self.positive) + len(self.negative))
+
+    def _buckets(self, magnitudes: np.ndarray) -> pd.Series:
+        if not len(magnitudes):
+            return pd.Series(dtype='int64')
+        index = np.ceil(np.log(magnitudes) / np.log(self.gamma)).astype('int64')
+        buckets, counts = np.unique(index, return_counts=True)
+        return pd.Series(counts, index=buckets)
+
+    def _value(self, index: np.ndarray) -> np.ndarray:
+        """Representative value of a bucket: relative error at most relative_accuracy."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+class HyperLogLog:
+    """Mergeable approximate distinct counter; merging takes the register-wise maximum."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray) -> "HyperLogLog":
+        """Adds values given as their 64-bit hashes."""
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        rest = hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))
+        # Position of the first set bit in the remaining 64 - p bits
+        rank = (64 - self.precision) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        merged = HyperLogLog(self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length() for uint64 arrays."""
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        values = np.where(high, values >> np.uint64(shift), values)
+    return length + (values > 0)
+
+def _exact_quantile(counts: pd.Series, q: float) -> float:
+    """Quantile from value counts, interpolated like Series.quantile()."""
+    counts = counts.sort_index()
+    ends = np.cumsum(counts.to_numpy())
+    position = q * (ends[-1] - 1)
+    lower = counts.index[np.searchsorted(ends, np.floor(position), side='right')]
+    upper = counts.index[np.searchsorted(ends, np.ceil(position), side='right')]
+    return float(lower + (upper - lower) * (position - np.floor(position)))
+
+class ColumnSummary:
+    """Statistics of one column that can be built per chunk and merged.
+
+    count/mean/variance (merged with Chan's formula) and min/max are exact;
+    quantiles come from a QuantileSketch and distinct counts from a
+    HyperLogLog. Columns with few distinct values also keep exact value
+    counts, which give exact quantiles and the most frequent value.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind  # "numeric", "datetime" or "text"
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Any = None
+        self.max: Any = None
+        self.sketch = QuantileSketch() if kind == "numeric" else None
+        self.distinct = HyperLogLog()
+        self.value_counts: Optional[pd.Series] = None
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "ColumnSummary":
+        if pd.api.types.is_bool_dtype(series) or not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series)):
+            kind = "text"
+        else:
+            kind = "datetime" if pd.api.types.is_datetime64_any_dtype(series) else "numeric"
+        summary = cls(kind)
+        present = series.dropna()
+        summary.count = len(present)
+        summary.missing = len(series) - len(present)
+        if kind == "numeric":
+            values = present.to_numpy(dtype=np.float64)
+            if len(values):
+                summary.mean = float(values.mean())
+                summary.m2 = float(((values - summary.mean) ** 2).sum())
+                summary.min, summary.max = float(values.min()), float(values.max())
+            summary.sketch.add(values)
+            counts = pd.Series(values).value_counts()
+            # Hash the float64 values, so 62 and 62.0 (int8 vs float32 columns) count once
+            hashes = pd.util.hash_array(counts.index.to_numpy())
+        elif kind == "datetime":
+            if len(present):
+                summary.min, summary.max = present.min(), present.max()
+            hashes = pd.util.hash_array(present.to_numpy(dtype='datetime64[ns]').view(np.int64))
+            # Only short columns can have few enough distinct timestamps to count exactly
+            counts = present.value_counts() if len(present) <= MAX_TRACKED_VALUES else None
+        else:
+            # Counted before the conversion to str, which is slow on long (categorical) columns
+            counts = present.value_counts()
+            counts = counts[counts > 0]
+            counts.index = counts.index.astype(str)
+            hashes = pd.util.hash_array(counts.index.to_numpy(dtype=object))
+        if counts is not None and len(counts) <= MAX_TRACKED_VALUES:
+            summary.value_counts = counts
+        summary.distinct.add(hashes)
+        return summary
+
+    def merge(self, other: "ColumnSummary") -> "ColumnSummary":
+        """Summary of both chunks; neither input is modified."""
+        if other.kind != self.kind:
+            raise ValueError(f"Can't merge a {other.kind} summary into a {self.kind} one")
+        merged = ColumnSummary(self.kind)
+        merged.count = self.count + other.count
+        merged.missing = self.missing + other.missing
+        if merged.count:
+            delta = other.mean - self.mean
+            merged.mean = self.mean + delta * other.count / merged.count
+            merged.m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / merged.count
+        bounds = [v for v in (self.min, other.min) if v is not None]
+        merged.min = min(bounds) if bounds else None
+        bounds = [v for v in (self.max, other.max) if v is not None]
+        merged.max = max(bounds) if bounds else None
+        if self.sketch is not None and other.sketch is not None:
+            merged.sketch = self.sketch.merge(other.sketch)
+        merged.distinct = self.distinct.merge(other.distinct)
+        if self.value_counts is not None and other.value_counts is not None:
+            counts = self.value_counts.add(other.value_counts, fill_value=0).astype('int64')
+            merged.value_counts = counts if len(counts) <= MAX_TRACKED_VALUES else None
+        return merged
+
+    def describe(self) -> Dict[str, Any]:
+        """describe()-style statistics, JSON friendly (inapplicable entries are left out)."""
+        if self.value_counts is not None:
+            unique = len(self.value_counts)
+        else:
+            unique = min(self.distinct.estimate(), self.count)
+        result: Dict[str, Any] = {"count": self.count, "missing": self.missing, "unique": unique}
+        if self.kind == "numeric" and self.count:
+            result["mean"] = self.mean
+            result["std"] = float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None
+            result["min"] = self.min
+            for name, q in SUMMARY_QUANTILES.items():
+                if self.value_counts is not None:
+                    result[name] = _exact_quantile(self.value_counts, q)
+                else:
+                    # Clamped, so the estimates never leave the exact range
+                    result[name] = min(max(self.sketch.quantile(q), self.min), self.max)
+            result["max"] = self.max
+        elif self.kind == "datetime" and self.count:
+            result["min"] = self.min.isoformat()
+            result["max"] = self.max.isoformat()
+        elif self.kind == "text" and self.value_counts is not None and len(self.value_counts):
+            counts = self.value_counts.sort_index().sort_values(ascending=False, kind='stable')
+            result["top"] = counts.index[0]
+            result["freq"] = int(counts.iloc[0])
+        return result
+
+    def nbytes(self) -> int:
+        size = self.distinct.registers.nbytes + (self.sketch.nbytes() if self.sketch is not None else 0)
+        if self.value_counts is not None:
+            size += int(self.value_counts.memory_usage(deep=True))
+        return size
+
+def summarize(df: pd.DataFrame) -> Dict[str, ColumnSummary]:
+    return {col: ColumnSummary.from_series(df[col]) for col in df.columns}
+
+def merge_summaries(summary: Dict[str, ColumnSummary], delta: Dict[str, ColumnSummary]) -> Dict[str, ColumnSummary]:
+    """Summaries of a frame after rows summarized in `delta` were appended to it."""
+    return {col: summary[col].merge(delta[col]) if col in delta else summary[col] for col in summary}
+
+def describe_summaries(summary: Dict[str, ColumnSummary]) -> Dict[str, Dict[str, Any]]:
+    return {col: column.describe() for col, column in summary.items()}
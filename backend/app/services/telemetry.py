@@ -0,0 +1,195 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond windowing up to long generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels, exported in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, exported in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {int(count)}")
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time; the callback returns {label value: number}."""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Dict[str, float]], label: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._collect = collect
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self._collect()
+        except Exception:
+            return lines
+        for key, value in sorted(values.items()):
+            labels = _format_labels((self.label,), (key,)) if self.label else ""
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+SPAN_SECONDS = registry.register(Histogram(
+    "health_span_seconds", "Duration of instrumented backend stages.", labels=("span",)))
+ERRORS = registry.register(Counter(
+    "health_errors_total", "Exceptions caught and handled by the backend.", labels=("where",)))
+HTTP_SECONDS = registry.register(Histogram(
+    "health_http_request_seconds", "HTTP request latency until the response starts.", labels=("method", "route", "status")))
+INSIGHT_REQUESTS = registry.register(Counter(
+    "health_insight_requests_total", "LLM insight requests by insight cache outcome.", labels=("cache",)))
+OLLAMA_QUEUE_SECONDS = registry.register(Histogram(
+    "health_ollama_queue_wait_seconds", "Time a generation waited for a free Ollama slot."))
+OLLAMA_CONNECT_SECONDS = registry.register(Histogram(
+    "health_ollama_connect_seconds", "Time until Ollama answered with response headers."))
+OLLAMA_FIRST_TOKEN_SECONDS = registry.register(Histogram(
+    "health_ollama_first_token_seconds", "Time from sending a generation to its first token."))
+OLLAMA_GENERATION_SECONDS = registry.register(Histogram(
+    "health_ollama_generation_seconds", "Total duration of an Ollama generation."))
+OLLAMA_LOAD_SECONDS = registry.register(Histogram(
+    "health_ollama_load_seconds", "Time Ollama spent loading the model into memory."))
+OLLAMA_PROMPT_EVAL_SECONDS = registry.register(Histogram(
+    "health_ollama_prompt_eval_seconds", "Time Ollama spent evaluating the prompt."))
+OLLAMA_EVAL_SECONDS = registry.register(Histogram(
+    "health_ollama_eval_seconds", "Time Ollama spent generating the response tokens."))
+OLLAMA_TOKENS_PER_SECOND = registry.register(Histogram(
+    "health_ollama_tokens_per_second", "Generation speed reported by Ollama.",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)))
+OLLAMA_TOKENS = registry.register(Counter(
+    "health_ollama_tokens_total", "Tokens processed by Ollama.", labels=("kind",)))
+OLLAMA_ERRORS = registry.register(Counter(
+    "health_ollama_errors_total", "Failed Ollama generations.", labels=("error",)))
+
+# Spans recorded during the current request, for the Server-Timing header
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("request_spans", default=None)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times a block into health_span_seconds and the current request's Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, span=name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+def timed(name: str):
+    """Decorator form of span() for whole functions."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count_error(where: str) -> None:
+    ERRORS.inc(where=where)
+
+def start_request() -> contextvars.Token:
+    """Starts collecting spans for the current request (context variables reach worker threads)."""
+    return _request_spans.set([])
+
+def finish_request(token: contextvars.Token) -> str:
+    """Stops collecting and returns the Server-Timing header value for the request's spans."""
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    totals: Dict[str, List[float]] = {}
+    for name, elapsed in spans:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+    return ", ".join(
+        f'{name};dur={total * 1000:.2f}' + (f';desc="x{count}"' if count > 1 else "")
+        for name, (total, count) in totals.items()
+    )
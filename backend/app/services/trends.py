@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+# Width of the LOESS neighbourhood as a share of the series, with a floor in days
+LOESS_FRACTION = 0.3
+LOESS_MIN_SPAN = 7
+# Robustness passes that down-weight outliers (bisquare on the residuals)
+LOESS_ITERATIONS = 2
+# Series with fewer valid points get no trend
+TREND_MIN_POINTS = 6
+
+TREND_BASELINES = ("ewma", "rolling")
+BASELINE_SPAN = 7
+
+# Binary segmentation: segments of at least CHANGE_POINT_MIN_SIZE points on
+# either side, and a level shift of at least CHANGE_POINT_THRESHOLD noise
+# standard errors
+CHANGE_POINT_MIN_SIZE = 5
+CHANGE_POINT_THRESHOLD = 4.0
+MAX_CHANGE_POINTS = 3
+
+def rolling_mean(values: np.ndarray, window: int = BASELINE_SPAN) -> np.ndarray:
+    """Centered rolling mean of every column of an (n, m) array, skipping NaNs."""
+    return pd.DataFrame(values).rolling(window, center=True, min_periods=1).mean().to_numpy()
+
+def ewma(values: np.ndarray, span: int = BASELINE_SPAN) -> np.ndarray:
+    """Exponentially weighted moving average of every column of an (n, m) array, skipping NaNs."""
+    return pd.DataFrame(values).ewm(span=span, ignore_na=True).mean().to_numpy()
+
+def loess(values: np.ndarray, fraction: float = LOESS_FRACTION, iterations: int = LOESS_ITERATIONS) -> np.ndarray:
+    """Robust local linear smoothing of every column of an (n, m) array of equally spaced points.
+
+    Each point is fitted from its neighbours within a tricube-weighted band
+    of `fraction` * n points. All columns are fitted at once: the band
+    weights are shared, and NaNs and outliers only zero out or shrink the
+    weights of their own column. Points without valid neighbours stay NaN.
+    """
+    n = values.shape[0]
+    x = np.arange(n, dtype=float)
+    span = max(fraction * n, LOESS_MIN_SPAN)
+    distance = np.abs(x[:, None] - x[None, :]) / span
+    band = np.where(distance < 1, (1 - distance ** 3) ** 3, 0.0)
+
+    valid = ~np.isnan(values)
+    # Columns without any value keep their all-NaN fit and skip the robustness pass
+    has_values = valid.any(axis=0)
+    y = np.where(valid, values, 0.0)
+    robustness = valid.astype(float)
+    fit = np.full(values.shape, np.nan)
+    for _ in range(iterations + 1):
+        w = robustness
+        s0 = band @ w
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_mean = (band @ (w * x[:, None])) / s0
+            y_mean = (band @ (w * y)) / s0
+            sxx = (band @ (w * x[:, None] ** 2)) / s0 - x_mean ** 2
+            sxy = (band @ (w * x[:, None] * y)) / s0 - x_mean * y_mean
+            slope = np.where(sxx > 1e-9, sxy / sxx, 0.0)
+        fit = y_mean + slope * (x[:, None] - x_mean)
+
+        residuals = np.where(valid, values - fit, np.nan)
+        scale = np.full(values.shape[1], np.inf)
+        scale[has_values] = 6 * np.nanmedian(np.abs(residuals[:, has_values]), axis=0)
+        with np.errstate(invalid='ignore'):
+            u = residuals / np.where(scale > 0, scale, np.inf)
+        robustness = np.where(valid & (np.abs(u) < 1), (1 - u ** 2) ** 2, 0.0)
+    return fit
+
+def change_points(values: np.ndarray, min_size: int = CHANGE_POINT_MIN_SIZE, threshold: float = CHANGE_POINT_THRESHOLD, max_points: int = MAX_CHANGE_POINTS) -> List[int]:
+    """Positions (into `values`) where the mean level shifts, by binary segmentation.
+
+    Every split of a segment is scored at once from cumulative sums; the
+    noise level is estimated from successive differences, so it isn't
+    inflated by the shifts themselves.
+    """
+    positions = np.flatnonzero(~np.isnan(values))
+    y = values[positions]
+    if len(y) < 2 * min_size:
+        return []
+    sigma = np.median(np.abs(np.diff(y))) / (0.6745 * np.sqrt(2))
+    if not sigma > 0:
+        return []
+    # Clip single outliers to the local median so they can't pose as a short segment
+    local = pd.Series(y).rolling(2 * min_size + 1, center=True, min_periods=1).median().to_numpy()
+    y = np.clip(y, local - 3 * sigma, local + 3 * sigma)
+
+    found = []
+    segments = [(0, len(y))]
+    while segments and len(found) < max_points:
+        best = None
+        for lo, hi in segments:
+            seg = y[lo:hi]
+            n = len(seg)
+            if n < 2 * min_size:
+                continue
+            k = np.arange(min_size, n - min_size + 1)
+            csum = np.cumsum(seg)
+            left = csum[k - 1] / k
+            right = (csum[-1] - csum[k - 1]) / (n - k)
+            score = np.abs(left - right) / (sigma * np.sqrt(1 / k + 1 / (n - k)))
+            i = int(np.argmax(score))
+            if score[i] >= threshold and (best is None or score[i] > best[0]):
+                best = (score[i], lo, hi, lo + int(k[i]))
+        if best is None:
+            break
+        _, lo, hi, split = best
+        found.append(split)
+        segments.remove((lo, hi))
+        segments += [(lo, split), (split, hi)]
+    return sorted(int(positions[i]) for i in found)
+
+def fit_trends(frame: pd.DataFrame, baseline: str = "ewma") -> Dict[str, Any]:
+    """Trend, baseline and change points of every column of a daily frame, in one pass.
+
+    Returns {"trend": frame, "baseline": frame, "change_points": {column:
+    [days]}}. Columns with fewer than TREND_MIN_POINTS values get an all-NaN
+    trend and no change points.
+    """
+    if baseline not in TREND_BASELINES:
+        raise ValueError(f"Unknown baseline '{baseline}'")
+    values = frame.to_numpy(dtype=float)
+    enough = (~np.isnan(values)).sum(axis=0) >= TREND_MIN_POINTS
+    trend = loess(values) if len(frame) else values.copy()
+    trend[:, ~enough] = np.nan
+    base = ewma(values) if baseline == "ewma" else rolling_mean(values)
+    return {
+        "trend": pd.DataFrame(trend, index=frame.index, columns=frame.columns),
+        "baseline": pd.DataFrame(base, index=frame.index, columns=frame.columns),
+        "change_points": {
+            col: [frame.index[i] for i in change_points(values[:, j])] if enough[j] else []
+            for j, col in enumerate(frame.columns)
+        },
+    }
+
+def trend_records(columns: Union[pd.DataFrame, Dict[str, Any]], fit: Dict[str, Any], metric: str, day_key: str = 'day') -> List[Dict[str, Any]]:
+    """Chart records of `columns`, each with the fitted trend of its day as trend_line.
+
+    `day_key` holds 'YYYY-MM-DD' strings. trend_line is only added when the
+    metric has a trend at all; days it doesn't cover get None.
+    """
+    if isinstance(columns, pd.DataFrame):
+        frame = columns.reset_index(drop=True)
+    else:
+        frame = pd.DataFrame({key: np.asarray(values) for key, values in columns.items()})
+    trend = fit["trend"].get(metric)
+    if trend is not None and trend.notna().any():
+        by_day = pd.Series(trend.round(2).to_numpy(), index=trend.index.strftime('%Y-%m-%d'))
+        trend_line = frame[day_key].map(by_day)
+        frame['trend_line'] = trend_line.astype(object).where(trend_line.notna(), None)
+    return frame.to_dict(orient='records')
+
+def summarize_trends(fit: Dict[str, Any], columns: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """JSON-friendly digest per column: latest baseline, trend slope per week and change point days."""
+    summary = {}
+    for col in columns if columns is not None else fit["trend"].columns:
+        if col not in fit["trend"]:
+            continue
+        trend = fit["trend"][col].dropna()
+        baseline = fit["baseline"][col].dropna()
+        slope = None
+        if len(trend) > 1:
+            days = (trend.index[-1] - trend.index[0]) / pd.Timedelta(days=1)
+            slope = round(float((trend.iloc[-1] - trend.iloc[0]) / days * 7), 2) + 0.0 if days else None
+        summary[col] = {
+            "baseline": round(float(baseline.iloc[-1]), 2) if len(baseline) else None,
+            "slope_per_week": slope,
+            "change_points": [day.strftime('%Y-%m-%d') for day in fit["change_points"][col]],
+        }
+    return summary
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .data_loader import DataLoader
+from .executor import run_blocking
+from .telemetry import count_error, span
+
+# Files read by the advanced reports, in the order they are preloaded
+REPORT_FILES = {
+    "heart_rate": ["heart_rate.csv", "sleep.csv", "vitality_score.csv"],
+    "sleep": ["sleep.csv", "heart_rate.csv", "oxygen_saturation.csv", "vitality_score.csv", "sleep_stage.csv"],
+}
+WARMUP_FILES = list(dict.fromkeys(f for files in REPORT_FILES.values() for f in files))
+
+# Report periods of the advanced analyses, in days
+PERIOD_DAYS = {"week": 7, "month": 30, "90d": 90, "180d": 180}
+
+# Set WARMUP=0 to skip preloading at startup (e.g. for benchmarks)
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") != "0"
+
+class Warmup:
+    """Preloads the report files, their rollups and column summaries in the background after startup.
+
+    Files are loaded one after another, so a single data worker is busy with
+    warm-up and the others stay free for requests. A request that needs a
+    file while it is being loaded waits for that load instead of parsing the
+    file a second time.
+    """
+
+    def __init__(self, files: Iterable[str] = WARMUP_FILES):
+        self.files = list(files)
+        self.state = "idle"
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.file_states: Dict[str, str] = {f: "pending" for f in self.files}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "disabled")
+
+    def start(self, loader: DataLoader) -> None:
+        if not WARMUP_ENABLED:
+            self.state = "disabled"
+            return
+        self.state = "warming"
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self._run(loader))
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def wait_for(self, filenames: Iterable[str]) -> None:
+        """Waits until none of the files is in the middle of its warm-up load."""
+        for filename in filenames:
+            future = self._loading.get(filename)
+            if future is not None:
+                # Shielded so a disconnecting client doesn't cancel the warm-up
+                await asyncio.shield(future)
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {"state": self.state, "seconds": elapsed, "files": dict(self.file_states)}
+
+    async def _run(self, loader: DataLoader) -> None:
+        loop = asyncio.get_running_loop()
+        for filename in self.files:
+            if not os.path.exists(os.path.join(loader.data_dir, filename)):
+                self.file_states[filename] = "missing"
+                continue
+            self.file_states[filename] = "loading"
+            future = self._loading[filename] = loop.create_future()
+            try:
+                await run_blocking(self._warm_file, loader, filename)
+                self.file_states[filename] = "ready"
+            except Exception as e:
+                print(f"Warm-up of {filename} failed: {e}")
+                count_error("warmup")
+                self.file_states[filename] = "error"
+            finally:
+                future.set_result(None)
+                del self._loading[filename]
+        self.state = "ready"
+        self.finished_at = time.monotonic()
+
+    def _warm_file(self, loader: DataLoader, filename: str) -> None:
+        with span("warmup"):
+            loader.column_summaries(filename)
+            for freq in ("hour", "day"):
+                try:
+                    loader.get_rollup(filename, freq)
+                except TypeError:
+                    # No datetime column: nothing to roll up
+                    return
+
+warmup = Warmup()
@@ -0,0 +1,112 @@
+"""Minimal stand-in for the Ollama HTTP API, so benchmarks don't depend on a GPU.
+
+Serves GET / and /api/tags, and POST /api/generate in both streaming (NDJSON)
+and non-streaming mode. Every generation emits a fixed number of thinking and
+response tokens with a configurable delay between them.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+class FakeOllama:
+    def __init__(self, model: str, token_delay: float = 0.002, thinking_tokens: int = 20, response_tokens: int = 80, port: int = 0):
+        self.model = model
+        self.token_delay = token_delay
+        self.thinking_tokens = thinking_tokens
+        self.response_tokens = response_tokens
+        self.generations = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def __enter__(self) -> "FakeOllama":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _final(self) -> Dict[str, Any]:
+        tokens = self.thinking_tokens + self.response_tokens
+        return {
+            "model": self.model,
+            "done": True,
+            "total_duration": int(tokens * self.token_delay * 1e9),
+            "prompt_eval_count": 500,
+            "prompt_eval_duration": int(0.1 * 1e9),
+            "eval_count": tokens,
+            "eval_duration": int(tokens * self.token_delay * 1e9),
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": fake.model}]})
+                else:
+                    body = b"Ollama is running"
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not request.get("prompt"):
+                    # Preload / keep-alive request: nothing to generate
+                    self._send_json({"model": fake.model, "response": "", "done": True})
+                    return
+                fake.generations += 1
+                tokens = [("thinking", f"step {i}. ") for i in range(fake.thinking_tokens)]
+                tokens += [("response", f"insight{i} ") for i in range(fake.response_tokens)]
+
+                if not request.get("stream", True):
+                    time.sleep(fake.token_delay * len(tokens))
+                    self._send_json({
+                        **fake._final(),
+                        "thinking": "".join(t for kind, t in tokens if kind == "thinking"),
+                        "response": "".join(t for kind, t in tokens if kind == "response"),
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write_chunk(payload: Dict[str, Any]) -> None:
+                    data = (json.dumps(payload) + "\n").encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+
+                for kind, text in tokens:
+                    write_chunk({"model": fake.model, kind: text, "done": False})
+                    time.sleep(fake.token_delay)
+                write_chunk({**fake._final(), "response": ""})
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
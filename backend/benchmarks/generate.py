@@ -0,0 +1,144 @@
+"""Synthetic Samsung Health export generator.
+
+Writes heart_rate.csv, sleep.csv, sleep_stage.csv, oxygen_saturation.csv and
+vitality_score.csv in the layout of the cleaned exports, for any span from a
+month up to several years of minute-resolution heart rate data:
+
+    python -m benchmarks.generate --days 3650 --out /tmp/health
+"""
+import argparse
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Samsung Health sleep stage codes
+STAGE_AWAKE, STAGE_LIGHT, STAGE_DEEP, STAGE_REM = 40001, 40002, 40003, 40004
+
+# Days generated per chunk; keeps memory flat for multi-year exports
+CHUNK_DAYS = 90
+
+DEVICES = ["a3f9e2c4b1", "7d0c5e8f21"]
+
+def generate_sleep(days: pd.DatetimeIndex, rng: np.random.Generator) -> pd.DataFrame:
+    """One sleep session per night, falling asleep around 23:00."""
+    bedtime = days + pd.Timedelta(hours=23) + pd.to_timedelta(rng.normal(0, 45, len(days)), unit='min')
+    duration = np.clip(rng.normal(440, 50, len(days)), 240, 600)
+    efficiency = np.clip(rng.normal(90, 4, len(days)), 70, 99).round(1)
+    score = np.clip(40 + duration / 12 + (efficiency - 85) + rng.normal(0, 5, len(days)), 30, 100).round()
+    return pd.DataFrame({
+        'start_time': bedtime.floor('min'),
+        'end_time': (bedtime + pd.to_timedelta(duration, unit='min')).floor('min'),
+        'sleep_score': score.astype(int),
+        'efficiency': efficiency,
+        'sleep_duration': duration.round().astype(int),
+        'physical_recovery': np.clip(score + rng.normal(0, 8, len(days)), 0, 100).round().astype(int),
+        'mental_recovery': np.clip(score + rng.normal(0, 8, len(days)), 0, 100).round().astype(int),
+    })
+
+def generate_stages(sleep: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Splits every session into 10-40 minute stage segments (light/deep/REM, some awake)."""
+    rows = []
+    stages = np.array([STAGE_LIGHT, STAGE_DEEP, STAGE_REM, STAGE_AWAKE])
+    for start, end in zip(sleep['start_time'], sleep['end_time']):
+        lengths = rng.integers(10, 40, 40)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        total = (end - start) / pd.Timedelta(minutes=1)
+        n = int(np.searchsorted(offsets, total))
+        seg_starts = start + pd.to_timedelta(offsets[:n], unit='min')
+        seg_ends = (start + pd.to_timedelta(np.minimum(offsets[1:n + 1], total), unit='min')).floor('min')
+        rows.append(pd.DataFrame({
+            'start_time': seg_starts,
+            'end_time': seg_ends,
+            'stage': rng.choice(stages, n, p=[0.5, 0.2, 0.22, 0.08]),
+        }))
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=['start_time', 'end_time', 'stage'])
+
+def asleep_mask(times: pd.DatetimeIndex, sleep: pd.DataFrame) -> np.ndarray:
+    """True for timestamps that fall inside a sleep session."""
+    starts = sleep['start_time'].to_numpy(dtype='datetime64[ns]')
+    ends = sleep['end_time'].to_numpy(dtype='datetime64[ns]')
+    values = times.to_numpy(dtype='datetime64[ns]')
+    pos = np.searchsorted(starts, values, side='right') - 1
+    return (pos >= 0) & (values < ends[np.clip(pos, 0, None)])
+
+def generate_heart_rate(start: pd.Timestamp, end: pd.Timestamp, sleep: pd.DataFrame, interval_min: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Circadian heart rate, lower while asleep, with noise, activity bursts and wear gaps."""
+    times = pd.date_range(start, end, freq=f'{interval_min}min', inclusive='left')
+    hours = (times.hour + times.minute / 60).to_numpy()
+    asleep = asleep_mask(times, sleep)
+    hr = 66 + 6 * np.sin((hours - 10) / 24 * 2 * np.pi) + rng.normal(0, 4, len(times))
+    hr[asleep] -= 10
+    bursts = rng.random(len(times)) < 0.01
+    hr[bursts] += rng.uniform(20, 70, bursts.sum())
+    # Watch off the wrist: about an hour per day without samples, plus random dropouts
+    worn = rng.random(len(times)) > 0.02
+    charging = (times.hour.to_numpy() == 19) & (rng.random(len(times)) < 0.9)
+    keep = worn & ~charging
+    return pd.DataFrame({
+        'start_time': times[keep],
+        'heart_rate': np.clip(hr[keep], 38, 190).round(),
+        'deviceuuid': rng.choice(DEVICES, keep.sum(), p=[0.9, 0.1]),
+    })
+
+def generate_spo2(sleep: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """SpO2 readings every 10 minutes during sleep."""
+    frames = []
+    for start, end in zip(sleep['start_time'], sleep['end_time']):
+        times = pd.date_range(start.ceil('10min'), end, freq='10min')
+        frames.append(pd.DataFrame({'start_time': times, 'spo2': np.clip(rng.normal(96, 1.5, len(times)), 85, 100).round().astype(int)}))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['start_time', 'spo2'])
+
+def generate_vitality(sleep: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """One overnight HRV (shrv) value per sleep session, written at wake-up."""
+    return pd.DataFrame({
+        'create_time': sleep['end_time'],
+        'shrv_value': np.clip(rng.normal(48, 9, len(sleep)), 15, 120).round(2),
+    })
+
+def generate(out_dir: str, days: int, hr_interval: int = 1, seed: int = 0, end: Optional[pd.Timestamp] = None) -> None:
+    """Writes `days` of synthetic data ending at `end` (default: now) into `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    end = (end if end is not None else pd.Timestamp.now()).floor('min')
+    start = (end - pd.Timedelta(days=days)).normalize()
+    writers = {}
+
+    def write(name: str, df: pd.DataFrame) -> None:
+        path = os.path.join(out_dir, name)
+        df.to_csv(path, mode='a' if name in writers else 'w', header=name not in writers, index=False)
+        writers[name] = True
+
+    chunk_start = start
+    previous_night = None
+    while chunk_start < end:
+        chunk_end = min(chunk_start + pd.Timedelta(days=CHUNK_DAYS), end)
+        nights = pd.date_range(chunk_start, chunk_end, freq='D', inclusive='left')
+        sleep = generate_sleep(nights, rng)
+        # Sessions still running when the export was taken are not in it yet
+        sleep = sleep[sleep['end_time'] < end].reset_index(drop=True)
+        # The last night of the previous chunk runs into this one
+        sessions = sleep if previous_night is None else pd.concat([previous_night, sleep], ignore_index=True)
+        write('heart_rate.csv', generate_heart_rate(chunk_start, chunk_end, sessions, hr_interval, rng))
+        write('sleep.csv', sleep)
+        write('sleep_stage.csv', generate_stages(sleep, rng))
+        write('oxygen_saturation.csv', generate_spo2(sleep, rng))
+        write('vitality_score.csv', generate_vitality(sleep, rng))
+        previous_night = sleep.tail(1)
+        chunk_start = chunk_end
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Samsung Health export")
+    parser.add_argument("--out", required=True, help="Target directory for the CSV files")
+    parser.add_argument("--days", type=int, default=365, help="Days of history (30 = one month, 3650 = ten years)")
+    parser.add_argument("--hr-interval", type=int, default=1, help="Minutes between heart rate samples")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out, args.days, args.hr_interval, args.seed)
+    for name in sorted(os.listdir(args.out)):
+        if name.endswith('.csv'):
+            print(f"{name}: {os.path.getsize(os.path.join(args.out, name)) / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Latency, memory and throughput benchmarks for the DataLoader and the API.
+
+Runs against a synthetic export (see benchmarks/generate.py) or an existing
+data directory, with Ollama replaced by a local fake server:
+
+    python -m benchmarks.run --days 365
+    python -m benchmarks.run --days 365 --save-baseline baseline.json
+    python -m benchmarks.run --days 365 --baseline baseline.json
+
+Every case is measured cold (fresh process state: new DataLoader, empty
+insight cache; Parquet sidecars are kept unless the case says "csv"; median
+of --cold-repeat runs), then warm over --repeat runs. Peak memory is the tracemalloc peak of a separate
+cold run. With --baseline, cases slower than the baseline by more than
+--tolerance are reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+# Keep benchmark runs out of the real insight cache; must be set before the app is imported
+_work_dir = tempfile.mkdtemp(prefix="health-bench-")
+os.environ.setdefault("INSIGHT_CACHE_PATH", os.path.join(_work_dir, "insights.sqlite3"))
+# Cold cases measure loading themselves; don't preload in the background
+os.environ.setdefault("WARMUP", "0")
+# Background insight generation would compete with the measured requests for Ollama
+os.environ.setdefault("PREGENERATE", "0")
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.api import endpoints
+from app.main import app
+from app.services.ai_service import MODEL_NAME, ai_service
+from app.services.data_loader import CACHE_DIR_NAME, DataLoader
+from app.services.insight_cache import InsightCache
+
+from .fake_ollama import FakeOllama
+from .generate import generate
+
+DATA_FILES = ["heart_rate.csv", "sleep.csv", "sleep_stage.csv", "oxygen_saturation.csv", "vitality_score.csv"]
+
+class Case:
+    """A named call plus the setup that puts the process back into its cold state."""
+
+    def __init__(self, name: str, call: Callable[[], Any], setup: Callable[[], None]):
+        self.name = name
+        self.call = call
+        self.setup = setup
+
+def measure(case: Case, repeat: int, cold_repeat: int = 3) -> Dict[str, float]:
+    cold = []
+    for _ in range(cold_repeat):
+        case.setup()
+        start = time.perf_counter()
+        case.call()
+        cold.append(time.perf_counter() - start)
+
+    case.setup()
+    tracemalloc.start()
+    try:
+        case.call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case.call()
+        warm.append(time.perf_counter() - start)
+    warm.sort()
+    return {
+        "cold_ms": statistics.median(cold) * 1000,
+        "warm_p50_ms": statistics.median(warm) * 1000,
+        "warm_p95_ms": warm[min(len(warm) - 1, int(round(0.95 * (len(warm) - 1))))] * 1000,
+        "throughput_per_s": len(warm) / sum(warm) if sum(warm) else float("inf"),
+        "peak_mb": peak / 1e6,
+    }
+
+def loader_cases(data_dir: str) -> List[Case]:
+    state: Dict[str, DataLoader] = {}
+
+    def fresh(drop_sidecars: bool = False) -> Callable[[], None]:
+        def setup():
+            if drop_sidecars:
+                shutil.rmtree(os.path.join(data_dir, CACHE_DIR_NAME), ignore_errors=True)
+            state["loader"] = DataLoader(data_dir)
+        return setup
+
+    cases = []
+    for filename in DATA_FILES:
+        load = lambda f=filename: state["loader"].load_csv(f)
+        cases.append(Case(f"load_csv {filename} (csv)", load, fresh(drop_sidecars=True)))
+        cases.append(Case(f"load_csv {filename} (sidecar)", load, fresh()))
+    for period, days in endpoints.PERIOD_DAYS.items():
+        cases.append(Case(f"aggregate_heart_rate_data {period}", lambda d=days: state["loader"].aggregate_heart_rate_data(d), fresh()))
+        cases.append(Case(f"aggregate_sleep_data {period}", lambda d=days: state["loader"].aggregate_sleep_data(d), fresh()))
+    return cases
+
+def api_cases(client: TestClient, data_dir: str) -> List[Case]:
+    counter = {"n": 0}
+
+    def fresh():
+        endpoints.data_loader = DataLoader(data_dir)
+        # A new, empty insight cache makes the next analysis a real generation
+        counter["n"] += 1
+        ai_service.insight_cache = InsightCache(os.path.join(_work_dir, f"insights-{counter['n']}.sqlite3"))
+
+    def get(url: str) -> Callable[[], Any]:
+        def call():
+            response = client.get(url)
+            response.raise_for_status()
+            return response.content
+        return call
+
+    def post(url: str, body: Dict[str, Any]) -> Callable[[], Any]:
+        def call():
+            response = client.post(url, json=body)
+            response.raise_for_status()
+            return response.content
+        return call
+
+    end = pd.Timestamp.now().floor("D")
+    cases = [
+        Case("GET /api/data/files", get("/api/data/files"), fresh),
+        Case("GET /api/data/heart_rate.csv?limit=100", get("/api/data/heart_rate.csv?limit=100"), fresh),
+        Case("GET /api/data/heart_rate.csv?max_points=1000", get("/api/data/heart_rate.csv?max_points=1000"), fresh),
+        Case("GET /api/data/heart_rate.csv/rows?limit=10000", get("/api/data/heart_rate.csv/rows?limit=10000"), fresh),
+        Case("GET /api/data/heart_rate.csv/summary", get("/api/data/heart_rate.csv/summary"), fresh),
+        Case("POST /api/metrics/query 365d day", post("/api/metrics/query", {
+            "start": (end - pd.Timedelta(days=365)).isoformat(),
+            "end": end.isoformat(),
+            "metrics": ["heart_rate", "hrv", "spo2", "sleep_score"],
+            "granularity": "day",
+        }), fresh),
+    ]
+    for period in endpoints.PERIOD_DAYS:
+        body = {"period": period, "skip_analysis": True}
+        cases.append(Case(f"POST /api/analyze/heart_rate/advanced {period} (data)", post("/api/analyze/heart_rate/advanced", body), fresh))
+        cases.append(Case(f"POST /api/analyze/sleep/advanced {period} (data)", post("/api/analyze/sleep/advanced", body), fresh))
+    cases.append(Case("POST /api/analyze/heart_rate/advanced month (insight)",
+                      post("/api/analyze/heart_rate/advanced", {"period": "month"}), fresh))
+    cases.append(Case("POST /api/analyze/sleep/advanced month (insight, stream)",
+                      post("/api/analyze/sleep/advanced", {"period": "month", "stream": True}), fresh))
+    return cases
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Names and ratios of the cases that got slower than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if "error" in current:
+            if before is None or "error" not in before:
+                regressions.append(f"{name}: failed ({current['error']})")
+            continue
+        if before is None or "error" in before:
+            continue
+        for key in ("cold_ms", "warm_p50_ms"):
+            # Ignore sub-millisecond jitter on very fast cases
+            if current[key] > before[key] * (1 + tolerance) and current[key] - before[key] > 1.0:
+                regressions.append(f"{name}: {key} {before[key]:.1f} -> {current[key]:.1f} ms (x{current[key] / before[key]:.2f})")
+    return regressions
+
+def print_table(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]]) -> None:
+    width = max(len(name) for name in results)
+    print(f"{'case':<{width}}  {'cold ms':>9}  {'p50 ms':>9}  {'p95 ms':>9}  {'ops/s':>9}  {'peak MB':>8}  {'vs base':>8}")
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<{width}}  FAILED {r['error']}")
+            continue
+        delta = ""
+        if baseline and baseline.get(name, {}).get("warm_p50_ms"):
+            delta = f"x{r['warm_p50_ms'] / baseline[name]['warm_p50_ms']:.2f}"
+        print(f"{name:<{width}}  {r['cold_ms']:9.1f}  {r['warm_p50_ms']:9.2f}  {r['warm_p95_ms']:9.2f}  "
+              f"{r['throughput_per_s']:9.1f}  {r['peak_mb']:8.1f}  {delta:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DataLoader and the API")
+    parser.add_argument("--data", help="Existing data directory (default: generate synthetic data)")
+    parser.add_argument("--days", type=int, default=365, help="Days of synthetic history to generate")
+    parser.add_argument("--hr-interval", type=int, default=1, help="Minutes between synthetic heart rate samples")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm runs per case")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="Cold runs per case")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Seconds per token of the fake Ollama")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a saved results file")
+    parser.add_argument("--save-baseline", help="Save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    data_dir = args.data
+    if data_dir is None:
+        data_dir = os.path.join(_work_dir, "data")
+        started = time.perf_counter()
+        generate(data_dir, args.days, args.hr_interval)
+        print(f"Generated {args.days} days of data in {time.perf_counter() - started:.1f}s ({data_dir})")
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    def run(cases: List[Case]) -> None:
+        for case in cases:
+            if args.filter in case.name:
+                try:
+                    results[case.name] = measure(case, args.repeat, args.cold_repeat)
+                except Exception as e:
+                    message = str(e).splitlines()[0] if str(e) else ""
+                    results[case.name] = {"error": f"{type(e).__name__}: {message}"}
+
+    try:
+        run(loader_cases(data_dir))
+        with FakeOllama(MODEL_NAME, token_delay=args.token_delay) as fake:
+            ai_service.ollama_url = fake.url
+            with TestClient(app, raise_server_exceptions=False) as client:
+                # The first request pays for route compilation; keep it out of the numbers
+                client.get("/health")
+                run(api_cases(client, data_dir))
+    finally:
+        shutil.rmtree(_work_dir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    report = {
+        "meta": {
+            "days": args.days if args.data is None else None,
+            "hr_interval": args.hr_interval,
+            "data": args.data,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+# The app reads these at import time: keep tests out of the real insight
+# cache and don't start background warm-up, model preload or pre-generation
+os.environ.setdefault("INSIGHT_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="health-test-"), "insights.sqlite3"))
+os.environ.setdefault("WARMUP", "0")
+os.environ.setdefault("OLLAMA_PRELOAD", "0")
+os.environ.setdefault("PREGENERATE", "0")
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Nothing listens here, so every Ollama call fails fast
+UNREACHABLE_OLLAMA_URL = "http://127.0.0.1:9/api/generate"
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    """A few weeks of synthetic exports in the cleaned CSV layout."""
+    out = tmp_path_factory.mktemp("cleaned")
+    rng = np.random.default_rng(0)
+    end = pd.Timestamp.now().floor("min")
+    start = end - pd.Timedelta(days=21)
+    times = pd.date_range(start, end, freq="15min")
+    pd.DataFrame({
+        "start_time": times,
+        "heart_rate": (65 + 10 * np.sin(np.arange(len(times)) / 50) + rng.normal(0, 5, len(times))).round(),
+        "deviceuuid": rng.choice(["a1", "b2"], len(times)),
+    }).to_csv(out / "heart_rate.csv", index=False)
+    nights = pd.date_range(start.normalize(), end.normalize(), freq="D") + pd.Timedelta(hours=23)
+    pd.DataFrame({
+        "start_time": nights,
+        "end_time": nights + pd.Timedelta(hours=7),
+        "sleep_score": rng.integers(60, 95, len(nights)),
+        "efficiency": rng.uniform(80, 98, len(nights)).round(1),
+        "sleep_duration": rng.integers(360, 480, len(nights)),
+        "physical_recovery": rng.integers(50, 100, len(nights)),
+        "mental_recovery": rng.integers(50, 100, len(nights)),
+    }).to_csv(out / "sleep.csv", index=False)
+    stages = [(night + pd.Timedelta(minutes=30 * k), night + pd.Timedelta(minutes=30 * (k + 1)), rng.choice(["light", "deep", "rem", "awake"]))
+              for night in nights for k in range(14)]
+    pd.DataFrame(stages, columns=["start_time", "end_time", "stage"]).to_csv(out / "sleep_stage.csv", index=False)
+    pd.DataFrame({"start_time": times[::2], "spo2": rng.integers(90, 100, len(times[::2]))}).to_csv(out / "oxygen_saturation.csv", index=False)
+    pd.DataFrame({"create_time": nights, "shrv_value": rng.uniform(30, 70, len(nights)).round(2)}).to_csv(out / "vitality_score.csv", index=False)
+    return str(out)
+
+@pytest.fixture
+def client(data_dir, monkeypatch):
+    """TestClient for the app on `data_dir`, with Ollama unreachable."""
+    from fastapi.testclient import TestClient
+
+    from app.api import endpoints
+    from app.main import app
+    from app.services.ai_service import ai_service
+    from app.services.data_loader import DataLoader
+
+    monkeypatch.setattr(endpoints, "data_loader", DataLoader(data_dir))
+    monkeypatch.setattr(ai_service, "ollama_url", UNREACHABLE_OLLAMA_URL)
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import data_loader as data_loader_module
+from app.services.data_loader import DataLoader
+
+HEADER = "start_time,heart_rate,deviceuuid\n"
+
+def rows(start, count, devices=("a1", "b2")):
+    times = pd.date_range(start, periods=count, freq="5min")
+    return "".join(f"{t},{60 + i % 40},{devices[i % len(devices)]}\n" for i, t in enumerate(times))
+
+def touch_later(path):
+    # Some filesystems keep the mtime when a rewrite happens within the same tick
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    (tmp_path / "hr.csv").write_text(HEADER + rows("2025-01-01", 500))
+    return tmp_path
+
+def test_append_matches_full_reload(csv_dir):
+    loader = DataLoader(str(csv_dir))
+    loader.load_csv("hr.csv")
+    with open(csv_dir / "hr.csv", "a") as f:
+        f.write(rows("2025-01-03", 200, devices=("a1", "b2", "c3")))
+    appended = loader.load_csv("hr.csv")
+    reloaded = DataLoader(str(csv_dir))._parse_csv(str(csv_dir / "hr.csv"))
+    reloaded = DataLoader(str(csv_dir))._compact(reloaded)
+
+    assert len(appended) == 700
+    assert isinstance(appended["deviceuuid"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(appended, reloaded, check_categorical=False)
+    assert appended["heart_rate"].dtype == reloaded["heart_rate"].dtype
+
+def test_rewrite_in_place_is_reloaded(csv_dir):
+    # Large enough that the middle lies outside the hashed head and tail
+    (csv_dir / "hr.csv").write_text(HEADER + rows("2025-01-01", 10000))
+    loader = DataLoader(str(csv_dir))
+    assert loader.load_csv("hr.csv")["heart_rate"].iloc[5010] == 70
+    lines = (csv_dir / "hr.csv").read_text().splitlines(keepends=True)
+    # Same size, one value changed
+    lines[5011] = lines[5011].replace(",70,", ",99,")
+    (csv_dir / "hr.csv").write_text("".join(lines))
+    touch_later(csv_dir / "hr.csv")
+    assert loader.load_csv("hr.csv")["heart_rate"].iloc[5010] == 99
+
+def test_rewrite_that_grows_is_reloaded(csv_dir):
+    loader = DataLoader(str(csv_dir))
+    loader.load_csv("hr.csv")
+    (csv_dir / "hr.csv").write_text(HEADER + rows("2024-06-01", 800))
+    touch_later(csv_dir / "hr.csv")
+    df = loader.load_csv("hr.csv")
+    assert len(df) == 800
+    assert df["start_time"].iloc[0] == pd.Timestamp("2024-06-01")
+
+def test_sidecar_writes_after_appends_are_throttled(csv_dir, monkeypatch):
+    monkeypatch.setattr(data_loader_module, "SIDECAR_WRITE_INTERVAL_SECONDS", 3600)
+    loader = DataLoader(str(csv_dir))
+    loader.load_csv("hr.csv")
+    writes = []
+    write_columnar = loader._write_columnar
+    monkeypatch.setattr(loader, "_write_columnar", lambda filename, entry: (writes.append(len(entry.frame)), write_columnar(filename, entry)))
+    for day in range(3):
+        with open(csv_dir / "hr.csv", "a") as f:
+            f.write(rows(f"2025-02-0{day + 1}", 10))
+        loader.load_csv("hr.csv")
+    assert writes == []
+    loader.flush_sidecars()
+    assert writes == [530]
+    loader.flush_sidecars()
+    assert writes == [530]
+
+def samples(times, values):
+    return pd.DataFrame({"start_time": pd.to_datetime(times), "heart_rate": values})
+
+def test_join_intervals_handles_overlapping_and_empty_sessions(tmp_path):
+    loader = DataLoader(str(tmp_path))
+    hr = samples(pd.date_range("2025-01-01 22:00", periods=13, freq="30min"), [float(v) for v in range(50, 63)])
+    sessions = pd.DataFrame({
+        "start_time": pd.to_datetime(["2025-01-01 23:00", "2025-01-02 00:00", "2025-01-03 00:00", None, "2025-01-02 01:00"]),
+        "end_time": pd.to_datetime(["2025-01-02 01:00", "2025-01-02 02:00", "2025-01-03 06:00", "2025-01-02 01:00", "2025-01-02 00:00"]),
+    }, index=[10, 11, 12, 13, 14])
+    joined = loader.join_intervals(sessions, hr, "heart_rate")
+
+    assert list(joined.index) == [10, 11, 12, 13, 14]
+    # Both bounds are inclusive, and overlapping sessions each get the shared samples
+    assert joined.loc[10, "count"] == 5 and joined.loc[10, "min"] == 52 and joined.loc[10, "max"] == 56
+    assert joined.loc[11, "count"] == 5 and joined.loc[11, "mean"] == 56
+    assert joined.loc[11, "p50"] == 56
+    # No samples, a missing bound and an inverted interval
+    for session in (12, 13, 14):
+        assert joined.loc[session, "count"] == 0
+        assert joined.loc[session, ["mean", "min", "max", "p5", "p50", "p95"]].isna().all()
+
+def test_join_intervals_matches_a_per_session_scan(tmp_path):
+    loader = DataLoader(str(tmp_path))
+    rng = np.random.default_rng(3)
+    times = pd.date_range("2025-01-01", periods=2000, freq="7min")
+    hr = samples(times, rng.normal(60, 8, len(times)))
+    hr.loc[rng.choice(len(hr), 50), "heart_rate"] = np.nan
+    starts = pd.Series(times[rng.choice(len(times), 40)])
+    sessions = pd.DataFrame({"start_time": starts, "end_time": starts + pd.to_timedelta(rng.integers(0, 600, 40), unit="min")})
+    joined = loader.join_intervals(sessions, hr, "heart_rate")
+
+    for i, session in sessions.iterrows():
+        inside = hr[(hr["start_time"] >= session["start_time"]) & (hr["start_time"] <= session["end_time"])]["heart_rate"].dropna()
+        assert joined.loc[i, "count"] == len(inside)
+        if len(inside):
+            assert joined.loc[i, "mean"] == pytest.approx(inside.mean())
+            assert joined.loc[i, "p95"] == pytest.approx(inside.quantile(0.95))
+
+def test_join_intervals_without_sessions_or_samples(tmp_path):
+    loader = DataLoader(str(tmp_path))
+    hr = samples(["2025-01-01 00:00"], [60.0])
+    no_sessions = pd.DataFrame({"start_time": pd.to_datetime([]), "end_time": pd.to_datetime([])})
+    assert loader.join_intervals(no_sessions, hr, "heart_rate").empty
+    sessions = pd.DataFrame({"start_time": pd.to_datetime(["2025-01-01"]), "end_time": pd.to_datetime(["2025-01-02"])})
+    assert loader.join_intervals(sessions, hr.iloc[0:0], "heart_rate")["count"].tolist() == [0]
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from app.services.downsampling import downsample_indices, minmax_indices
+
+@pytest.mark.parametrize("max_points", [3, 4, 5, 10, 99])
+def test_minmax_respects_max_points(max_points):
+    y = np.sin(np.linspace(0, 20, 1000)) * np.linspace(1, 3, 1000)
+    keep = minmax_indices(y, max_points)
+    assert len(keep) <= max_points
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+
+def test_minmax_with_three_points_keeps_the_largest_spike():
+    y = np.zeros(100)
+    y[40] = 5.0
+    y[70] = -9.0
+    assert list(minmax_indices(y, 3)) == [0, 70, 99]
+
+def test_downsample_indices_minmax_at_lower_bound():
+    x = np.arange(50, dtype=float)
+    y = np.random.default_rng(0).normal(size=50)
+    assert len(downsample_indices(x, y, 3, "minmax")) <= 3
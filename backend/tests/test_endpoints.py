@@ -0,0 +1,82 @@
+def test_sleep_insight_with_columnar_format(client):
+    response = client.post("/api/analyze/sleep/advanced", json={"period": "week", "format": "columnar"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["period"] == "week"
+    assert isinstance(body["insight"], str)
+    series = [value for value in body["data_used"].values() if isinstance(value, (list, dict))]
+    assert series
+    for value in series:
+        assert not (isinstance(value, list) and value and isinstance(value[0], dict))
+    assert isinstance(body["data_used"]["sleep_metrics"], dict)
+
+def test_sleep_insight_with_records_format(client):
+    response = client.post("/api/analyze/sleep/advanced", json={"period": "week"})
+    assert response.status_code == 200
+    body = response.json()
+    assert isinstance(body["insight"], str)
+    assert isinstance(body["data_used"]["sleep_metrics"], list)
+
+def test_report_etag_depends_on_period(client):
+    def fetch(period, etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        return client.post("/api/analyze/sleep/advanced", json={"period": period, "skip_analysis": True, "format": "columnar", "end": "2030-01-01T00:00:00"}, headers=headers)
+
+    week = fetch("week")
+    assert week.status_code == 200
+    assert fetch("week", week.headers["ETag"]).status_code == 304
+    # An unknown period falls back to the same 30 days as "month" but answers with its own name
+    month = fetch("month")
+    other = fetch("last30", month.headers["ETag"])
+    assert other.status_code == 200
+    assert other.json()["period"] == "last30"
+
+def test_status_and_metrics_read_the_insight_cache(client):
+    status = client.get("/api/ai/status")
+    assert status.status_code == 200
+    assert "entries" in status.json()["insight_cache"]
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert "health_insight_cache_entries" in metrics.text
+
+def write_ties(path, rows):
+    with open(path, "a") as f:
+        for minute, value in rows:
+            f.write(f"2025-01-01 00:{minute:02d}:00,{value}\n")
+
+def test_row_cursor_pages_through_ties_without_gaps(client, tmp_path, monkeypatch):
+    from app.api import endpoints
+    from app.services.data_loader import DataLoader
+
+    (tmp_path / "ties.csv").write_text("start_time,value\n")
+    # Runs of equal timestamps that straddle the page boundaries
+    write_ties(tmp_path / "ties.csv", [(minute, minute * 10 + i) for minute in range(6) for i in range(minute % 3 + 1)])
+    monkeypatch.setattr(endpoints, "data_loader", DataLoader(str(tmp_path)))
+
+    values, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/data/ties.csv/rows", params=params)
+        assert response.status_code == 200
+        values += [int(line.split('"value":')[1].rstrip("}")) for line in response.text.splitlines()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    expected = [minute * 10 + i for minute in range(6) for i in range(minute % 3 + 1)]
+    assert values == expected
+    assert pages == 6
+
+def test_row_cursor_is_rejected_after_the_file_changed(client, tmp_path, monkeypatch):
+    from app.api import endpoints
+    from app.services.data_loader import DataLoader
+
+    (tmp_path / "ties.csv").write_text("start_time,value\n")
+    write_ties(tmp_path / "ties.csv", [(minute, minute) for minute in range(5)])
+    monkeypatch.setattr(endpoints, "data_loader", DataLoader(str(tmp_path)))
+
+    first = client.get("/api/data/ties.csv/rows", params={"limit": 2})
+    cursor = first.headers["X-Next-Cursor"]
+    write_ties(tmp_path / "ties.csv", [(30, 30)])
+    assert client.get("/api/data/ties.csv/rows", params={"limit": 2, "cursor": cursor}).status_code == 409
+    assert client.get("/api/data/ties.csv/rows", params={"limit": 2, "cursor": "42"}).status_code == 400
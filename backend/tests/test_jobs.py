@@ -0,0 +1,54 @@
+import time
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/api/analyze/jobs/{job_id}").json()
+        if status["state"] in ("done", "error") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.05)
+
+def test_failed_generation_ends_job_in_error(client):
+    submitted = client.post("/api/analyze/jobs", json={"report": "sleep", "period": "month"})
+    assert submitted.status_code == 202
+
+    status = wait_for_job(client, submitted.json()["job_id"])
+    assert status["state"] == "error"
+    assert status["result"] is None
+    assert status["error"]
+
+    events = client.get(f"/api/analyze/jobs/{status['job_id']}/events").text
+    assert "event: error" in events
+    assert "event: done" not in events
+
+def test_unknown_report_is_rejected(client):
+    response = client.post("/api/analyze/jobs", json={"report": "steps", "period": "week"})
+    assert response.status_code == 400
+
+def test_unfinished_job_is_reused_only_for_the_same_reference(client, monkeypatch):
+    import asyncio
+
+    import pandas as pd
+
+    from app.api import endpoints
+
+    def slow_job(report, period, reference):
+        async def run(job):
+            await asyncio.sleep(0.5)
+            yield ("result", {"end": reference.isoformat()})
+        return run
+
+    reference = {"now": pd.Timestamp("2025-03-01 23:00")}
+    monkeypatch.setattr(endpoints, "report_job", slow_job)
+    monkeypatch.setattr(endpoints.data_loader.metrics, "reference_time", lambda: reference["now"])
+
+    def submit(**body):
+        return client.post("/api/analyze/jobs", json={"report": "heart_rate", "period": "week", **body}).json()["job_id"]
+
+    first = submit()
+    assert submit() == first
+    assert submit(end="2025-03-01T23:00:00") == first
+    reference["now"] = pd.Timestamp("2025-03-02 00:00")
+    after_midnight = submit()
+    assert after_midnight != first
+    assert wait_for_job(client, after_midnight)["result"] == {"end": "2025-03-02T00:00:00"}
@@ -0,0 +1,67 @@
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.services.data_loader import DataLoader
+
+def test_concurrent_misses_share_one_computation(data_dir):
+    engine = DataLoader(data_dir).metrics
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"value": 42}
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(engine._memo, ("sleep.csv",), ("test",), compute) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result() for f in futures]
+    assert calls == [1]
+    assert all(r == {"value": 42} for r in results)
+    assert engine.stats()["misses"] == 1
+    assert engine.stats()["coalesced"] == 7
+
+def test_failed_computation_is_retried(data_dir):
+    engine = DataLoader(data_dir).metrics
+
+    def fail():
+        raise ValueError("boom")
+
+    try:
+        engine._memo(("sleep.csv",), ("test",), fail)
+    except ValueError:
+        pass
+    assert engine._memo(("sleep.csv",), ("test",), lambda: 1) == 1
+
+def test_concurrent_reports_load_each_file_once(data_dir, tmp_path, monkeypatch):
+    # A copy without the sidecars other tests may have written, so every file is parsed
+    data_dir = shutil.copytree(data_dir, tmp_path / "cleaned", ignore=shutil.ignore_patterns(".cache"))
+    loader = DataLoader(str(data_dir))
+    parsed = []
+    parse_csv = loader._parse_csv
+
+    def slow_parse(source):
+        parsed.append(str(source))
+        time.sleep(0.05)
+        return parse_csv(source)
+
+    monkeypatch.setattr(loader, "_parse_csv", slow_parse)
+    reference = pd.Timestamp.now().ceil("D")
+    with ThreadPoolExecutor(4) as pool:
+        reports = [
+            pool.submit(loader.aggregate_sleep_data, 7, reference),
+            pool.submit(loader.aggregate_heart_rate_data, 7, reference),
+            pool.submit(loader.aggregate_sleep_data, 7, reference),
+            pool.submit(loader.aggregate_heart_rate_data, 7, reference),
+        ]
+        sleep_a, heart_a, sleep_b, heart_b = [f.result() for f in reports]
+    assert len(parsed) == len(set(parsed)) == 5
+    assert sleep_a == sleep_b and heart_a == heart_b
+    # The sequential result of a fresh loader matches what the concurrent reports shared
+    assert DataLoader(data_dir).aggregate_heart_rate_data(7, reference)["metrics"] == heart_a["metrics"]
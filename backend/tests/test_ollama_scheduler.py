@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.services.ollama_scheduler import GenerationPreempted, GenerationScheduler
+
+def slow_run(started, release):
+    async def run():
+        started.set()
+        # Ignores the first cancellation for a moment, like a generation closing its stream
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.05)
+            raise
+        yield ("response", "done")
+    return run
+
+async def quick_run():
+    yield ("response", "answer")
+
+async def drain(generation):
+    return [event async for event in generation.subscribe()]
+
+def test_repeated_preemption_cancels_a_background_generation_once():
+    async def scenario():
+        scheduler = GenerationScheduler(max_inflight=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        background = scheduler.submit("bg", slow_run(started, release), "background")
+        await started.wait()
+
+        first = scheduler.submit("a", quick_run)
+        second = scheduler.submit("b", quick_run)
+        assert scheduler.preempted == 1
+
+        with pytest.raises(GenerationPreempted):
+            await drain(background)
+        assert await drain(first) == [("response", "answer")]
+        assert await drain(second) == [("response", "answer")]
+        assert scheduler.preempted == 1
+        assert scheduler.idle
+
+    asyncio.run(scenario())
+
+def test_identical_requests_share_one_generation():
+    async def scenario():
+        scheduler = GenerationScheduler(max_inflight=1)
+        calls = []
+
+        async def run():
+            calls.append(1)
+            yield ("response", "answer")
+
+        first = scheduler.submit("same", run)
+        second = scheduler.submit("same", run)
+        assert first is second
+        assert await drain(first) == [("response", "answer")]
+        assert calls == [1]
+        assert scheduler.coalesced == 1
+
+    asyncio.run(scenario())
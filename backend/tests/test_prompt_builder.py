@@ -0,0 +1,63 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.ai_service import ai_service
+from app.services.prompt_builder import PROMPT_TOKEN_BUDGET, compact_series, estimate_tokens, format_number
+
+SLEEP_COLUMNS = ['sleep_score', 'efficiency', 'sleep_duration', 'physical_recovery', 'mental_recovery']
+
+def sleep_records(days):
+    rng = np.random.default_rng(days)
+    return [
+        {
+            "day": day.strftime('%Y-%m-%d'),
+            "sleep_score": float(rng.integers(60, 95)),
+            "efficiency": float(rng.uniform(80, 98)),
+            "sleep_duration": float(rng.integers(360, 480)),
+            "physical_recovery": float(rng.integers(50, 100)),
+            "mental_recovery": float(rng.integers(50, 100)),
+        }
+        for day in pd.date_range("2024-01-01", periods=days, freq="D")
+    ]
+
+@pytest.mark.parametrize("days", [1, 7, 30, 90, 180, 730])
+@pytest.mark.parametrize("budget", [200, PROMPT_TOKEN_BUDGET])
+def test_series_fits_the_token_budget(days, budget):
+    records = sleep_records(days)
+    text = compact_series(records, SLEEP_COLUMNS, budget=budget)
+    assert estimate_tokens(text) <= budget
+    # The whole period stays covered however coarse the buckets get
+    assert text.startswith(f"{records[0]['day']} to {records[-1]['day']}, {days} days.")
+
+def test_short_series_keeps_every_day():
+    text = compact_series(sleep_records(7), SLEEP_COLUMNS)
+    assert "Rows: day minus the period mean." in text
+    assert len(text.splitlines()) == 2 + 3 + 7
+
+def test_series_without_data():
+    assert compact_series([], SLEEP_COLUMNS) == "No data."
+    assert compact_series([{"day": "2025-01-01", "sleep_score": None}], SLEEP_COLUMNS) == "No data."
+
+def test_format_number():
+    assert format_number(61.0) == "61"
+    assert format_number(-0.04) == "0"
+    assert format_number(2.345, 2, signed=True) == "+2.35"
+    assert format_number(float("nan")) == ""
+
+def test_report_prompt_data_stays_within_budget(monkeypatch):
+    payloads = []
+
+    async def capture(payload, *args, **kwargs):
+        payloads.append(payload)
+        return {"insight": "", "cache": "miss", "timings": None}
+
+    monkeypatch.setattr(ai_service, "_run", capture)
+    data = {"metrics": {}, "stages_summary": {"deep": 1234.0, "light": 2345.0}, "trends": {}, "sleep_metrics": sleep_records(730)}
+    asyncio.run(ai_service.analyze_sleep_advanced(data, "730d"))
+    prompt = payloads[0]["prompt"]
+    series = prompt.split("Sleep Trend:\n")[1].split("\nTrend analysis")[0]
+    assert estimate_tokens(series) <= PROMPT_TOKEN_BUDGET
+    assert "2024-01-01 to 2025-12-30" in series
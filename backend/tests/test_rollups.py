@@ -0,0 +1,65 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_loader import DataLoader
+
+def raw(data_dir, filename="heart_rate.csv"):
+    df = pd.read_csv(f"{data_dir}/{filename}", parse_dates=["start_time"])
+    return df.set_index("start_time")
+
+@pytest.mark.parametrize("freq, alias", [("hour", "h"), ("day", "D")])
+def test_rollup_matches_groupby(data_dir, freq, alias):
+    rollup = DataLoader(data_dir).get_rollup("heart_rate.csv", freq)["heart_rate"]
+    values = raw(data_dir)["heart_rate"]
+    expected = values.groupby(values.index.floor(alias)).agg(["count", "sum", "min", "max"])
+    expected["sumsq"] = (values ** 2).groupby(values.index.floor(alias)).sum()
+    pd.testing.assert_frame_equal(rollup, expected, check_dtype=False, check_names=False, check_index_type=False, rtol=1e-9)
+
+@pytest.mark.parametrize("start, end", [
+    ("2020-01-01", "2100-01-01"),
+    # Partial days at both edges
+    (-15.3, -4.7),
+    # Inside a single day
+    (-3.9, -3.2),
+    (-1.0, -1.0),
+])
+def test_window_stats_match_pandas(data_dir, start, end):
+    values = raw(data_dir)["heart_rate"]
+    now = values.index.max().ceil("D")
+    start = now + pd.Timedelta(days=start) if isinstance(start, float) else pd.Timestamp(start)
+    end = now + pd.Timedelta(days=end) if isinstance(end, float) else pd.Timestamp(end)
+    inside = values[(values.index >= start) & (values.index < end)].dropna()
+
+    stats = DataLoader(data_dir).window_stats("heart_rate.csv", "heart_rate", start, end)
+    assert stats["count"] == len(inside)
+    if len(inside) == 0:
+        assert stats["mean"] is None
+        return
+    assert stats["mean"] == pytest.approx(inside.mean())
+    assert stats["min"] == inside.min() and stats["max"] == inside.max()
+    assert stats["std"] == pytest.approx(inside.std())
+
+def test_rollup_range_edges_are_exact(data_dir):
+    loader = DataLoader(data_dir)
+    values = raw(data_dir)["heart_rate"]
+    start = values.index[100] + pd.Timedelta(minutes=7)
+    end = values.index[-100] - pd.Timedelta(minutes=7)
+    daily = loader.rollup_range("heart_rate.csv", "heart_rate", start, end, "day")
+    inside = values[(values.index >= start) & (values.index < end)]
+    expected = inside.groupby(inside.index.floor("D")).agg(["count", "sum", "min", "max"])
+    pd.testing.assert_frame_equal(daily[["count", "sum", "min", "max"]], expected, check_dtype=False, check_names=False, check_index_type=False, rtol=1e-9)
+
+def test_rollup_is_merged_on_append(data_dir, tmp_path):
+    data_dir = shutil.copytree(data_dir, tmp_path / "cleaned", ignore=shutil.ignore_patterns(".cache"))
+    loader = DataLoader(str(data_dir))
+    loader.get_rollup("heart_rate.csv", "day")
+    last = raw(data_dir).index.max()
+    with open(data_dir / "heart_rate.csv", "a") as f:
+        for i in range(1, 300):
+            f.write(f"{last + pd.Timedelta(minutes=15 * i)},{60 + i % 30}.0,a1\n")
+    merged = loader.get_rollup("heart_rate.csv", "day")["heart_rate"]
+    rebuilt = DataLoader(str(data_dir))._aggregate_buckets(raw(data_dir).reset_index(), ["heart_rate"], "D")["heart_rate"]
+    pd.testing.assert_frame_equal(merged, rebuilt, check_dtype=False, check_names=False, check_index_type=False, rtol=1e-9)
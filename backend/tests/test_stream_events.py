@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from app.services import ai_service as ai_service_module
+from app.services.ai_service import STREAM_FRAME_CHARS, STREAM_FRAME_SECONDS, ai_service
+
+def collect(events, on_error=lambda e: f"failed: {e}"):
+    async def run():
+        return [(kind, data, time.monotonic()) async for kind, data in ai_service._stream_events(events, "miss", on_error)]
+    return asyncio.run(run())
+
+def texts(received, kind):
+    return [data["text"] for k, data, _ in received if k == kind]
+
+def test_burst_is_flushed_by_size(monkeypatch):
+    # Only the size limit may cut frames here, however slow the machine
+    monkeypatch.setattr(ai_service_module, "STREAM_FRAME_SECONDS", 60)
+
+    async def burst():
+        for i in range(200):
+            yield ('response', f"token{i:04d} ")
+
+    received = collect(burst())
+    frames = texts(received, 'response')
+    assert "".join(frames) == "".join(f"token{i:04d} " for i in range(200))
+    tokens_per_frame = -(-STREAM_FRAME_CHARS // 10)
+    assert len(frames) == -(-200 // tokens_per_frame)
+    assert all(len(frame) >= STREAM_FRAME_CHARS for frame in frames[:-1])
+    assert received[-1][:2] == ('done', {"cache": "miss", "error": None})
+
+def test_stalled_stream_is_flushed_by_time():
+    produced = {}
+
+    async def stalled():
+        yield ('response', "Hello")
+        yield ('response', ", ")
+        await asyncio.sleep(STREAM_FRAME_SECONDS * 6)
+        produced["world"] = time.monotonic()
+        yield ('response', "world")
+
+    received = collect(stalled())
+    assert texts(received, 'response') == ["Hello, ", "world"]
+    # The first frame went out while the source was still stalled
+    assert received[0][2] < produced["world"]
+
+def test_kind_change_flushes_and_metrics_follow():
+    async def generation():
+        yield ('thinking', "hmm")
+        yield ('thinking', "...")
+        yield ('response', "Answer")
+        yield ('done', {"eval_count": 10, "eval_duration": 2_000_000_000, "total_duration": 3_000_000_000})
+
+    received = collect(generation())
+    kinds = [kind for kind, _, _ in received]
+    assert kinds == ['thinking', 'response', 'metrics', 'done']
+    assert texts(received, 'thinking') == ["hmm..."]
+    assert received[2][1]["eval_seconds"] == 2.0
+
+def test_error_ends_the_stream_with_its_message(monkeypatch):
+    monkeypatch.setattr(ai_service_module, "STREAM_FRAME_SECONDS", 60)
+
+    async def failing():
+        yield ('response', "partial")
+        raise ConnectionError("Ollama went away")
+
+    received = collect(failing())
+    assert texts(received, 'response') == ["partial", "failed: Ollama went away"]
+    assert received[-1][:2] == ('done', {"cache": "miss", "error": "Ollama went away"})
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_loader import DataLoader
+from app.services.summary import (
+    HLL_PRECISION, MAX_TRACKED_VALUES, SKETCH_RELATIVE_ACCURACY, ColumnSummary, HyperLogLog, QuantileSketch,
+)
+
+# Four standard errors of a HyperLogLog with HLL_PRECISION registers
+HLL_TOLERANCE = 4 * 1.04 / np.sqrt(1 << HLL_PRECISION)
+
+def true_quantile(values, q):
+    """The value the sketch estimates: rank floor(q * (n - 1)) of the sorted values."""
+    return np.sort(values)[int(np.floor(q * (len(values) - 1)))]
+
+def assert_within_accuracy(estimate, true):
+    assert abs(estimate - true) <= SKETCH_RELATIVE_ACCURACY * abs(true) + 1e-12
+
+def hashes(values):
+    return pd.util.hash_array(np.asarray(values))
+
+@pytest.mark.parametrize("q", [0.0, 0.01, 0.25, 0.5, 0.75, 0.99, 1.0])
+def test_quantile_sketch_relative_error(q):
+    rng = np.random.default_rng(4)
+    values = np.concatenate([rng.lognormal(4, 1.5, 20000), -rng.lognormal(1, 1, 5000), np.zeros(100)])
+    sketch = QuantileSketch().add(values)
+    assert sketch.count == len(values)
+    assert_within_accuracy(sketch.quantile(q), true_quantile(values, q))
+
+def test_quantile_sketch_merge_equals_one_pass():
+    rng = np.random.default_rng(5)
+    values = rng.normal(60, 15, 30000)
+    parts = np.array_split(values, 3)
+    merged = QuantileSketch().add(parts[0]).merge(QuantileSketch().add(parts[1])).merge(QuantileSketch().add(parts[2]))
+    whole = QuantileSketch().add(values)
+    pd.testing.assert_series_equal(merged.positive.sort_index(), whole.positive.sort_index())
+    for q in (0.05, 0.5, 0.95):
+        assert merged.quantile(q) == whole.quantile(q)
+        assert_within_accuracy(merged.quantile(q), true_quantile(values, q))
+
+def test_quantile_sketch_is_empty_without_values():
+    assert QuantileSketch().add(np.array([np.nan])).quantile(0.5) is None
+
+@pytest.mark.parametrize("distinct", [10, 1000, 100000])
+def test_hyperloglog_count_tolerance(distinct):
+    values = np.arange(distinct, dtype=np.int64) * 7919
+    estimate = HyperLogLog().add(hashes(np.repeat(values, 3))).estimate()
+    assert abs(estimate - distinct) <= max(1, HLL_TOLERANCE * distinct)
+
+def test_hyperloglog_merge_counts_the_union():
+    a = HyperLogLog().add(hashes(np.arange(0, 60000)))
+    b = HyperLogLog().add(hashes(np.arange(40000, 100000)))
+    assert abs(a.merge(b).estimate() - 100000) <= HLL_TOLERANCE * 100000
+    np.testing.assert_array_equal(a.merge(b).registers, HyperLogLog().add(hashes(np.arange(100000))).registers)
+
+def test_summary_merged_on_append_stays_within_bounds(tmp_path):
+    rng = np.random.default_rng(6)
+    times = pd.date_range("2025-01-01", periods=40000, freq="min")
+    values = rng.lognormal(4, 0.5, len(times)).round(3)
+    frame = pd.DataFrame({"start_time": times, "value": values})
+    frame.iloc[:30000].to_csv(tmp_path / "samples.csv", index=False)
+    loader = DataLoader(str(tmp_path))
+    loader.get_summary("samples.csv")
+    with open(tmp_path / "samples.csv", "a") as f:
+        frame.iloc[30000:].to_csv(f, index=False, header=False)
+    summary = loader.get_summary("samples.csv")["value"]
+
+    assert loader.column_summaries("samples.csv")["value"].value_counts is None
+    full = pd.Series(values)
+    assert summary["count"] == len(full)
+    assert summary["mean"] == pytest.approx(full.mean())
+    assert summary["std"] == pytest.approx(full.std())
+    assert summary["min"] == full.min() and summary["max"] == full.max()
+    for name, q in (("25%", 0.25), ("50%", 0.5), ("75%", 0.75)):
+        assert_within_accuracy(summary[name], true_quantile(values, q))
+    assert abs(summary["unique"] - full.nunique()) <= HLL_TOLERANCE * full.nunique()
+
+def test_low_cardinality_columns_stay_exact():
+    series = pd.Series(np.arange(MAX_TRACKED_VALUES) % 7, dtype="int8")
+    merged = ColumnSummary.from_series(series[:500]).merge(ColumnSummary.from_series(series[500:])).describe()
+    assert merged["unique"] == 7
+    for name, q in (("25%", 0.25), ("50%", 0.5), ("75%", 0.75)):
+        assert merged[name] == series.quantile(q)
@@ -0,0 +1,44 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from app.services.trends import TREND_MIN_POINTS, fit_trends, loess, summarize_trends
+
+def daily(**columns):
+    n = len(next(iter(columns.values())))
+    return pd.DataFrame(columns, index=pd.date_range("2025-01-01", periods=n, freq="D"))
+
+def test_all_nan_column_fits_without_warnings():
+    rng = np.random.default_rng(1)
+    frame = daily(score=70 + rng.normal(0, 2, 30), spo2=np.full(30, np.nan))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        fit = fit_trends(frame)
+    assert fit["trend"]["spo2"].isna().all()
+    assert fit["trend"]["score"].notna().all()
+    assert fit["change_points"]["spo2"] == []
+    assert summarize_trends(fit)["spo2"] == {"baseline": None, "slope_per_week": None, "change_points": []}
+
+def test_short_series_gets_no_trend():
+    frame = daily(score=np.arange(TREND_MIN_POINTS - 1, dtype=float))
+    fit = fit_trends(frame)
+    assert fit["trend"]["score"].isna().all()
+    assert fit["baseline"]["score"].notna().all()
+    assert fit["change_points"]["score"] == []
+    assert fit_trends(daily(score=np.array([], dtype=float)))["trend"].empty
+
+def test_planted_change_point_is_found():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([60 + rng.normal(0, 1, 20), 68 + rng.normal(0, 1, 20)])
+    frame = daily(resting_hr=values)
+    fit = fit_trends(frame)
+    days = fit["change_points"]["resting_hr"]
+    assert len(days) == 1
+    assert abs((days[0] - frame.index[20]).days) <= 1
+
+def test_loess_ignores_a_single_outlier():
+    values = np.linspace(50, 60, 31)
+    values[15] = 200
+    fit = loess(values[:, None])[:, 0]
+    assert abs(fit[15] - 55) < 1
@@ -62,7 +62,7 @@ export function DataChart({ title, description, data, type = "bar", dataKey, cat
                 }}
                 formatter={(value, name) => [
                     typeof value === 'number' ? value.toFixed(1) : value,
-                    name === 'trend_line' ? 'Trend (Poly 5°)' : title
+                    name === 'trend_line' ? 'Trend (LOESS)' : title
                 ]}
             />
         );
@@ -19,7 +19,6 @@ export function SleepAnalysis() {
 
     const {
         processStream,
-        streamingContent,
         thoughts,
         finalResponse,
         isThinking,
@@ -1,17 +1,40 @@
 import { useState, useCallback } from 'react';
 
+// Splits a buffer of Server-Sent Events into complete frames and the
+// unfinished rest. Only the new part of the stream is ever scanned.
+function takeFrames(buffer) {
+    const frames = [];
+    let start = 0;
+    let end;
+    while ((end = buffer.indexOf('\n\n', start)) !== -1) {
+        frames.push(buffer.slice(start, end));
+        start = end + 2;
+    }
+    return { frames, rest: buffer.slice(start) };
+}
+
+function parseFrame(frame) {
+    let event = 'message';
+    const data = [];
+    for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+    }
+    return { event, data: data.length ? JSON.parse(data.join('\n')) : null };
+}
+
 export function useAIStream() {
-    const [streamingContent, setStreamingContent] = useState('');
     const [thoughts, setThoughts] = useState('');
     const [finalResponse, setFinalResponse] = useState('');
+    const [metrics, setMetrics] = useState(null);
     const [isThinking, setIsThinking] = useState(false);
     const [isStreaming, setIsStreaming] = useState(false);
     const [error, setError] = useState(null);
 
     const resetStream = () => {
-        setStreamingContent('');
         setThoughts('');
         setFinalResponse('');
+        setMetrics(null);
         setIsThinking(false);
         setIsStreaming(false);
         setError(null);
@@ -37,45 +60,26 @@ export function useAIStream() {
 
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
-            let accumulatedText = '';
+            let buffer = '';
 
             while (true) {
                 const { done, value } = await reader.read();
                 if (done) break;
 
-                const chunk = decoder.decode(value, { stream: true });
-                accumulatedText += chunk;
-                console.log("Stream Chunk:", chunk); // DEBUG
-                // console.log("Accumulated:", accumulatedText); // DEBUG
-                // setStreamingContent(prev => prev + chunk);
-
-                // Parse <think> tags
-                // We want to separate content inside <think>...</think> from the rest
-                const thinkOpenIndex = accumulatedText.indexOf('<think>');
-                const thinkCloseIndex = accumulatedText.indexOf('</think>');
-
-                if (thinkOpenIndex !== -1 && thinkCloseIndex !== -1) {
-                    // Thinking complete
-                    const thoughtsContent = accumulatedText.substring(thinkOpenIndex + 7, thinkCloseIndex);
-                    const finalContent = accumulatedText.substring(thinkCloseIndex + 8);
+                const { frames, rest } = takeFrames(buffer + decoder.decode(value, { stream: true }));
+                buffer = rest;
 
-                    setThoughts(thoughtsContent);
-                    setFinalResponse(finalContent);
-                    setIsThinking(false);
-                } else if (thinkOpenIndex !== -1) {
-                    // Still thinking (open tag found, no close tag)
-                    const thoughtsContent = accumulatedText.substring(thinkOpenIndex + 7);
-                    setThoughts(thoughtsContent);
-                    setFinalResponse('');
-                    setIsThinking(true);
-                } else {
-                    // No think tag found yet
-                    // If the text is getting long and no <think>, assume it's just response
-                    if (accumulatedText.length > 50) {
+                // The server sends typed events with tokens already batched,
+                // so each one is a single append
+                for (const frame of frames) {
+                    const { event, data } = parseFrame(frame);
+                    if (event === 'thinking') {
+                        setThoughts(prev => prev + data.text);
+                    } else if (event === 'response') {
                         setIsThinking(false);
-                        setFinalResponse(accumulatedText);
-                    } else {
-                        // Buffer small initial content
+                        setFinalResponse(prev => prev + data.text);
+                    } else if (event === 'metrics') {
+                        setMetrics(data);
                     }
                 }
             }
@@ -90,9 +94,9 @@ export function useAIStream() {
 
     return {
         processStream,
-        streamingContent,
         thoughts,
         finalResponse,
+        metrics,
         isThinking,
         isStreaming,
         error,